@@ -0,0 +1,72 @@
+from os import getenv
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def getenv_bool(name: str, default: bool) -> bool:
+    value = getenv(name)
+    return default if value is None else value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+POSTGRES_USER = getenv('POSTGRES_USER')
+POSTGRES_PASSWORD = getenv('POSTGRES_PASSWORD')
+POSTGRES_DB = getenv('POSTGRES_DB')
+POSTGRES_HOST = getenv('POSTGRES_HOST', 'localhost')
+POSTGRES_PORT = int(getenv('POSTGRES_PORT', 5432))
+
+#   реплика только для чтения; если хост не задан, чтение идёт с основной БД
+POSTGRES_REPLICA_HOST = getenv('POSTGRES_REPLICA_HOST') or None
+POSTGRES_REPLICA_PORT = int(getenv('POSTGRES_REPLICA_PORT') or POSTGRES_PORT)
+POSTGRES_REPLICA_DB = getenv('POSTGRES_REPLICA_DB') or POSTGRES_DB
+#   сколько секунд после записи клиент читает с основной БД, чтобы видеть свои изменения
+READ_YOUR_WRITES_SECONDS = int(getenv('READ_YOUR_WRITES_SECONDS', 5))
+
+#   движок и пул соединений
+DB_ECHO = getenv_bool('DB_ECHO', False)  # логирование каждого SQL-запроса, только для отладки
+DB_POOL_SIZE = int(getenv('DB_POOL_SIZE', 5))  # постоянные соединения пула
+DB_MAX_OVERFLOW = int(getenv('DB_MAX_OVERFLOW', 10))  # дополнительные соединения сверх DB_POOL_SIZE при пиках
+DB_POOL_TIMEOUT = float(getenv('DB_POOL_TIMEOUT', 30))  # сколько секунд ждать свободного соединения
+DB_POOL_RECYCLE = int(getenv('DB_POOL_RECYCLE', 1800))  # через сколько секунд переоткрывать соединение
+DB_POOL_PRE_PING = getenv_bool('DB_POOL_PRE_PING', True)  # проверять соединение перед выдачей из пула
+DB_STATEMENT_CACHE_SIZE = int(getenv('DB_STATEMENT_CACHE_SIZE', 100))  # кэш подготовленных запросов asyncpg
+
+SECRET_KEY = getenv('SECRET_KEY')
+ALGORITHM = getenv('ALGORITHM')
+
+#   статический bearer-токен для сборщика метрик (Prometheus); без него /metrics доступны только администраторам
+METRICS_TOKEN = getenv('METRICS_TOKEN') or None
+
+#   время жизни access-токена (в минутах) и refresh-токена (в днях)
+ACCESS_TOKEN_MINUTES = int(getenv('ACCESS_TOKEN_MINUTES', 20))
+REFRESH_TOKEN_DAYS = int(getenv('REFRESH_TOKEN_DAYS', 30))
+
+#   размер страницы в списках товаров: по умолчанию и максимально допустимый в запросе
+PAGE_SIZE = int(getenv('PAGE_SIZE', 50))
+MAX_PAGE_SIZE = int(getenv('MAX_PAGE_SIZE', 200))
+
+#   как часто (в секундах) кэш дерева категорий сверяет свою версию с БД
+CATEGORY_CACHE_TTL = float(getenv('CATEGORY_CACHE_TTL', 5))
+
+#   сколько строк массовой загрузки товаров проверяется и записывается одной транзакцией
+IMPORT_BATCH_SIZE = int(getenv('IMPORT_BATCH_SIZE', 1000))
+
+#   сколько строк выгрузки каталога читается из серверного курсора за раз
+EXPORT_FETCH_SIZE = int(getenv('EXPORT_FETCH_SIZE', 1000))
+
+#   кэш карточек товаров: максимальное число записей и время жизни записи в секундах
+PRODUCT_CACHE_SIZE = int(getenv('PRODUCT_CACHE_SIZE', 1024))
+PRODUCT_CACHE_TTL = float(getenv('PRODUCT_CACHE_TTL', 60))
+
+#   пул потоков для bcrypt: число одновременно хешируемых паролей и длина очереди ожидания
+BCRYPT_WORKERS = int(getenv('BCRYPT_WORKERS', 4))
+BCRYPT_QUEUE_LIMIT = int(getenv('BCRYPT_QUEUE_LIMIT', 64))
+
+#   максимальное число проверенных access-токенов, которые хранятся в кэше
+TOKEN_CACHE_SIZE = int(getenv('TOKEN_CACHE_SIZE', 10000))
+
+#   сжатие ответов: минимальный размер тела в байтах, уровень gzip (1-9) и качество brotli (0-11)
+COMPRESSION_MINIMUM_SIZE = int(getenv('COMPRESSION_MINIMUM_SIZE', 1024))
+GZIP_LEVEL = int(getenv('GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(getenv('BROTLI_QUALITY', 5))
@@ -1,9 +1,34 @@
+from time import time
 from typing import AsyncGenerator
+
+from fastapi import Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.backend.db import async_session_maker
+from app.backend.config import READ_YOUR_WRITES_SECONDS
+from app.backend.db import async_session_maker, read_session_maker
+
+#  cookie с моментом, до которого клиент читает с основной БД после своей записи
+PRIMARY_PIN_COOKIE = 'read_primary_until'
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
 
 
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
+async def get_db(request: Request, response: Response) -> AsyncGenerator[AsyncSession, None]:
+    if request.method not in READ_METHODS and READ_YOUR_WRITES_SECONDS > 0:
+        response.set_cookie(PRIMARY_PIN_COOKIE, str(int(time()) + READ_YOUR_WRITES_SECONDS),
+                            max_age=READ_YOUR_WRITES_SECONDS, httponly=True)
     async with async_session_maker() as session:
+        yield session
+
+
+def pinned_to_primary(request: Request) -> bool:
+    '''клиент недавно что-то записал, и реплика могла ещё не получить его изменения'''
+    try:
+        return int(request.cookies.get(PRIMARY_PIN_COOKIE, 0)) > time()
+    except ValueError:
+        return False
+
+
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    session_maker = async_session_maker if pinned_to_primary(request) else read_session_maker
+    async with session_maker() as session:
         yield session
\ No newline at end of file
@@ -1,8 +1,24 @@
 from fastapi import FastAPI
-from app.routers import category, products, auth, permission, reviews
+from app.routers import category, products, auth, permission, reviews, metrics
+from app.backend.config import COMPRESSION_MINIMUM_SIZE, GZIP_LEVEL, BROTLI_QUALITY
+from app.backend.db import engine, read_engine
+from app.services.metrics import instrument_engine, metrics_middleware
+from app.services.negotiation import CompressionMiddleware
 
 app = FastAPI()
 
+#  сжатие ответов по Accept-Encoding. Подключается раньше метрик и поэтому оказывается внутри них:
+#  так оно видит тело ответа целиком (снаружи middleware метрик отдаёт тело потоком и порог размера
+#  не сработал бы), а время сжатия входит в замеренную длительность запроса
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MINIMUM_SIZE,
+                   gzip_level=GZIP_LEVEL, brotli_quality=BROTLI_QUALITY)
+
+#  замеры времени ответа и числа SQL-запросов по каждому маршруту, отдаются на /metrics
+app.middleware('http')(metrics_middleware)
+instrument_engine(engine)
+if read_engine is not engine:
+    instrument_engine(read_engine)
+
 
 @app.get("/")
 async def welcome() -> dict:
@@ -13,4 +29,5 @@ app.include_router(category.router)
 app.include_router(products.router)
 app.include_router(auth.router)
 app.include_router(permission.router)
-app.include_router(reviews.router)
\ No newline at end of file
+app.include_router(reviews.router)
+app.include_router(metrics.router)
\ No newline at end of file
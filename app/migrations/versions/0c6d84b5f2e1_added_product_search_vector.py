@@ -0,0 +1,32 @@
+"""Added product search vector
+
+Revision ID: 0c6d84b5f2e1
+Revises: a47c2f9e8b13
+Create Date: 2026-10-17 12:08:30.641207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0c6d84b5f2e1'
+down_revision: Union[str, None] = 'a47c2f9e8b13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('products', sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(
+        "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(description, ''))", persisted=True),
+                                        nullable=True))
+    op.create_index('ix_products_search_vector', 'products', ['search_vector'], unique=False,
+                    postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_products_search_vector', table_name='products', postgresql_using='gin')
+    op.drop_column('products', 'search_vector')
@@ -0,0 +1,42 @@
+"""Added rating aggregates to products
+
+Revision ID: 5b0e7d21c4a9
+Revises: 82f1fe142f39
+Create Date: 2026-10-17 09:12:41.518302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b0e7d21c4a9'
+down_revision: Union[str, None] = '82f1fe142f39'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('products', sa.Column('rating_sum', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('products', sa.Column('rating_count', sa.Integer(), server_default='0', nullable=False))
+
+    #  заполняем накопленные значения по уже существующим активным оценкам
+    op.execute("""
+        UPDATE products
+        SET rating_sum = agg.rating_sum,
+            rating_count = agg.rating_count,
+            rating = round(agg.rating_sum::numeric / agg.rating_count, 1)
+        FROM (SELECT product_id, sum(grade) AS rating_sum, count(*) AS rating_count
+              FROM ratings
+              WHERE is_active
+              GROUP BY product_id) AS agg
+        WHERE products.id = agg.product_id
+    """)
+    op.execute("UPDATE products SET rating = 0.0 WHERE rating_count = 0")
+
+
+def downgrade() -> None:
+    op.drop_column('products', 'rating_count')
+    op.drop_column('products', 'rating_sum')
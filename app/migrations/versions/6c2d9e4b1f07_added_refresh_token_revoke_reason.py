@@ -0,0 +1,28 @@
+"""Added refresh token revoke reason
+
+Revision ID: 6c2d9e4b1f07
+Revises: f1a7c3d92b84
+Create Date: 2026-10-17 21:14:05.327418
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6c2d9e4b1f07'
+down_revision: Union[str, None] = 'f1a7c3d92b84'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('refresh_tokens', sa.Column('revoked_reason', sa.String(), nullable=True))
+    op.create_index(op.f('ix_refresh_tokens_expires_at'), 'refresh_tokens', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_refresh_tokens_expires_at'), table_name='refresh_tokens')
+    op.drop_column('refresh_tokens', 'revoked_reason')
@@ -0,0 +1,40 @@
+"""Added product listing indexes
+
+Revision ID: 7f2b5e90a3c8
+Revises: 0c6d84b5f2e1
+Create Date: 2026-10-17 13:21:05.227841
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f2b5e90a3c8'
+down_revision: Union[str, None] = '0c6d84b5f2e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+#  частичные индексы под фильтры и сортировки списков товаров: имя -> столбцы
+ON_SALE_INDEXES = {
+    'ix_products_on_sale_category': ['category_id', 'id'],
+    'ix_products_on_sale_category_price': ['category_id', 'price', 'id'],
+    'ix_products_on_sale_category_rating': ['category_id', 'rating', 'id'],
+    'ix_products_on_sale_price': ['price', 'id'],
+    'ix_products_on_sale_rating': ['rating', 'id'],
+}
+
+
+def upgrade() -> None:
+    for name, columns in ON_SALE_INDEXES.items():
+        op.create_index(name, 'products', columns, unique=False,
+                        postgresql_where=sa.text('is_active AND stock > 0'))
+    op.create_index(op.f('ix_products_supplier_id'), 'products', ['supplier_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_products_supplier_id'), table_name='products')
+    for name in ON_SALE_INDEXES:
+        op.drop_index(name, table_name='products')
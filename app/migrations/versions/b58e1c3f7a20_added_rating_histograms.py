@@ -0,0 +1,41 @@
+"""Added rating histograms
+
+Revision ID: b58e1c3f7a20
+Revises: 7f2b5e90a3c8
+Create Date: 2026-10-17 16:05:12.640918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b58e1c3f7a20'
+down_revision: Union[str, None] = '7f2b5e90a3c8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('rating_histograms',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('grade', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('product_id', 'grade')
+    )
+
+    #  заполняем гистограммы по уже существующим активным оценкам
+    op.execute("""
+        INSERT INTO rating_histograms (product_id, grade, count)
+        SELECT product_id, grade, count(*)
+        FROM ratings
+        WHERE is_active
+        GROUP BY product_id, grade
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('rating_histograms')
@@ -0,0 +1,27 @@
+"""Added review listing index
+
+Revision ID: d3f4a81c9e56
+Revises: b58e1c3f7a20
+Create Date: 2026-10-17 17:21:48.093117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3f4a81c9e56'
+down_revision: Union[str, None] = 'b58e1c3f7a20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_reviews_product_date', 'reviews', ['product_id', 'comment_date', 'id'], unique=False,
+                    postgresql_where=sa.text('is_active'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_reviews_product_date', table_name='reviews')
@@ -0,0 +1,34 @@
+"""Added foreign key indexes
+
+Revision ID: f1a7c3d92b84
+Revises: d3f4a81c9e56
+Create Date: 2026-10-17 18:02:37.511640
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1a7c3d92b84'
+down_revision: Union[str, None] = 'd3f4a81c9e56'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_categories_parent_id'), 'categories', ['parent_id'], unique=False)
+    op.create_index(op.f('ix_refresh_tokens_user_id'), 'refresh_tokens', ['user_id'], unique=False)
+    op.create_index('ix_ratings_active_product', 'ratings', ['product_id', 'grade'], unique=False,
+                    postgresql_where=sa.text('is_active'))
+    op.create_index('ix_products_active_category', 'products', ['category_id', 'id'], unique=False,
+                    postgresql_where=sa.text('is_active'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_products_active_category', table_name='products')
+    op.drop_index('ix_ratings_active_product', table_name='ratings')
+    op.drop_index(op.f('ix_refresh_tokens_user_id'), table_name='refresh_tokens')
+    op.drop_index(op.f('ix_categories_parent_id'), table_name='categories')
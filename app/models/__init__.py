@@ -1,4 +1,6 @@
 from app.models.products import Product
 from app.models.category import Category
 from app.models.user import User
-from app.models.reviews import Review, Rating
\ No newline at end of file
+from app.models.reviews import Review, Rating, RatingHistogram
+from app.models.versions import ResourceVersion
+from app.models.tokens import RefreshToken
\ No newline at end of file
@@ -10,6 +10,6 @@ class Category(Base):
     name = Column(String)
     slug = Column(String, unique=True, index=True)
     is_active = Column(Boolean, default=True)
-    parent_id = Column(Integer, ForeignKey('categories.id'), nullable=True)
+    parent_id = Column(Integer, ForeignKey('categories.id'), nullable=True, index=True)
 
     products = relationship("Product", back_populates="category")
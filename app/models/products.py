@@ -1,11 +1,28 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, Boolean, Float
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, ForeignKey, Integer, String, Boolean, Float, Computed, Index, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 
 from app.backend.db import Base
 
 
 class Product(Base):
     __tablename__ = 'products'
+    __table_args__ = (
+        Index('ix_products_search_vector', 'search_vector', postgresql_using='gin'),
+        #  частичные индексы под фильтры и сортировки списков: в них только товары, которые есть в продаже
+        Index('ix_products_on_sale_category', 'category_id', 'id',
+              postgresql_where=text('is_active AND stock > 0')),
+        Index('ix_products_on_sale_category_price', 'category_id', 'price', 'id',
+              postgresql_where=text('is_active AND stock > 0')),
+        Index('ix_products_on_sale_category_rating', 'category_id', 'rating', 'id',
+              postgresql_where=text('is_active AND stock > 0')),
+        Index('ix_products_on_sale_price', 'price', 'id',
+              postgresql_where=text('is_active AND stock > 0')),
+        Index('ix_products_on_sale_rating', 'rating', 'id',
+              postgresql_where=text('is_active AND stock > 0')),
+        #  списки категории вместе с отсутствующими на складе товарами (in_stock=false)
+        Index('ix_products_active_category', 'category_id', 'id', postgresql_where=text('is_active')),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String)
@@ -15,10 +32,16 @@ class Product(Base):
     image_url = Column(String)
     stock = Column(Integer)
     rating = Column(Float, default=0.0)
+    rating_sum = Column(Integer, default=0, nullable=False)  # сумма активных оценок товара
+    rating_count = Column(Integer, default=0, nullable=False)  # количество активных оценок товара
     is_active = Column(Boolean, default=True)
 
     category_id = Column(Integer, ForeignKey('categories.id'))
-    supplier_id = Column(Integer, ForeignKey('users.id'), nullable=True)
+    supplier_id = Column(Integer, ForeignKey('users.id'), nullable=True, index=True)
+
+    #  поисковый вектор по названию и описанию, вычисляется самим Postgres и в ответы не загружается
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(description, ''))", persisted=True)))
 
     category = relationship('Category', back_populates='products')
     reviews = relationship('Review', back_populates='product')
@@ -1,6 +1,6 @@
 from datetime import datetime, timezone
 
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.schema import UniqueConstraint
 
@@ -9,12 +9,16 @@ from app.backend.db import Base
 
 class Review(Base):
     __tablename__ = 'reviews'
-    __table_args__ = (UniqueConstraint('user_id', 'product_id', name='uc_review_user_product'),)
+    __table_args__ = (
+        UniqueConstraint('user_id', 'product_id', name='uc_review_user_product'),
+        #  страницы отзывов товара, новые первыми: диапазон по индексу без сортировки
+        Index('ix_reviews_product_date', 'product_id', 'comment_date', 'id', postgresql_where=text('is_active')),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     comment = Column(String)
     is_active = Column(Boolean, default=True)
-    comment_date = Column(DateTime, default=datetime.now())
+    comment_date = Column(DateTime, default=datetime.now)
     user_id = Column(Integer, ForeignKey('users.id'))
     product_id = Column(Integer, ForeignKey('products.id'))
     rating_id = Column(Integer, ForeignKey('ratings.id'))
@@ -26,7 +30,11 @@ class Review(Base):
 
 class Rating(Base):
     __tablename__ = 'ratings'
-    __table_args__ = (UniqueConstraint('user_id', 'product_id', name='uc_rating_user_product'),)
+    __table_args__ = (
+        UniqueConstraint('user_id', 'product_id', name='uc_rating_user_product'),
+        #  активные оценки товара: пересчёт агрегатов и гистограмм только по индексу
+        Index('ix_ratings_active_product', 'product_id', 'grade', postgresql_where=text('is_active')),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     grade = Column(Integer)
@@ -37,3 +45,12 @@ class Rating(Base):
     user = relationship('User', back_populates='ratings')
     product = relationship('Product', back_populates='ratings')
     reviews = relationship('Review', back_populates='ratings')
+
+
+class RatingHistogram(Base):
+    '''количество активных оценок товара по каждому значению оценки; поддерживается при записи отзывов'''
+    __tablename__ = 'rating_histograms'
+
+    product_id = Column(Integer, ForeignKey('products.id'), primary_key=True)
+    grade = Column(Integer, primary_key=True)
+    count = Column(Integer, default=0, nullable=False)
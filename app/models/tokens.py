@@ -0,0 +1,25 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime
+from sqlalchemy.orm import relationship
+
+from app.backend.db import Base
+
+#  почему refresh-токен погашен (RefreshToken.revoked_reason)
+ROTATED = 'rotated'  # обменян на новую пару в /auth/refresh; повторное предъявление - признак кражи
+LOGOUT = 'logout'  # отозван клиентом в /auth/revoke
+REUSE = 'reuse'  # отозван вместе со всеми токенами пользователя после повторного предъявления
+
+
+class RefreshToken(Base):
+    __tablename__ = 'refresh_tokens'
+
+    id = Column(Integer, primary_key=True, index=True)
+    token_hash = Column(String, unique=True, index=True)  # sha256 токена, сам токен в БД не хранится
+    user_id = Column(Integer, ForeignKey('users.id'), index=True)
+    expires_at = Column(DateTime, index=True)
+    created_at = Column(DateTime, default=datetime.now)
+    is_active = Column(Boolean, default=True)
+    revoked_reason = Column(String, nullable=True)  # ROTATED, LOGOUT или REUSE для погашенных токенов
+
+    user = relationship('User')
@@ -0,0 +1,13 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, DateTime
+
+from app.backend.db import Base
+
+
+class ResourceVersion(Base):
+    __tablename__ = 'resource_versions'
+
+    name = Column(String, primary_key=True)  # имя ресурса, например 'categories'
+    version = Column(Integer, default=0, nullable=False)  # увеличивается при каждом изменении ресурса
+    updated_at = Column(DateTime, default=datetime.now)
@@ -1,20 +1,24 @@
 from typing import Annotated
 from datetime import datetime, timedelta, timezone
+from hashlib import sha256
+from secrets import token_urlsafe
+from time import time
 
 from fastapi import APIRouter, status, Depends, HTTPException
 from fastapi.security import HTTPBasic, HTTPBasicCredentials, OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import insert, select
-from passlib.context import CryptContext
+from sqlalchemy import insert, select, update
 from jose import jwt, JWTError, ExpiredSignatureError
 
 from app.backend.db_depends import get_db
-from app.backend.db import SECRET_KEY, ALGORITHM
-from app.schemas import CreateUser
+from app.backend.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_MINUTES, REFRESH_TOKEN_DAYS
+from app.schemas import CreateUser, TokenRefresh, Tokens, CurrentUser, TransactionResult
 from app.models.user import User
+from app.models.tokens import RefreshToken, ROTATED, LOGOUT, REUSE
+from app.services.hashing import password_hasher
+from app.services.cache import token_cache, MISSING
 
 router = APIRouter(prefix="/auth", tags=["auth"])
-bcrypt_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
 
 #  механизм базовой авторизации
 # security = HTTPBasic()
@@ -36,7 +40,7 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl='auth/token')
 
 async def authenticate_user(db: Annotated[AsyncSession, Depends(get_db)], username: str, password: str):
     user = await db.scalar(select(User).where(User.username == username))
-    if not user or not bcrypt_context.verify(password, user.hashed_password) or not user.is_active:
+    if not user or not await password_hasher.verify(password, user.hashed_password) or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials",
@@ -54,7 +58,34 @@ def create_access_token(username: str, user_id: int, is_admin: bool, is_supplier
     return jwt.encode(encode, key=SECRET_KEY, algorithm=ALGORITHM)
 
 
-def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
+def hash_refresh_token(refresh_token: str) -> str:
+    return sha256(refresh_token.encode()).hexdigest()
+
+
+async def issue_tokens(db: AsyncSession, user: User) -> dict:
+    '''выпускает пользователю <user> access-токен и новый refresh-токен (сохраняется в текущей транзакции <db>)'''
+    access_token = create_access_token(user.username, user.id, user.is_admin, user.is_supplier, user.is_customer,
+                                       expires_delta=timedelta(minutes=ACCESS_TOKEN_MINUTES))
+    refresh_token = token_urlsafe(32)
+    await db.execute(insert(RefreshToken).values(token_hash=hash_refresh_token(refresh_token),
+                                                 user_id=user.id,
+                                                 expires_at=datetime.now() + timedelta(days=REFRESH_TOKEN_DAYS)))
+    return {
+        'access_token': access_token,
+        'refresh_token': refresh_token,
+        'token_type': 'bearer'
+    }
+
+
+async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
+    #  зависимость асинхронная: проверка подписи - короткая работа без ввода-вывода, а token_cache
+    #  не потокобезопасен, и синхронная зависимость обращалась бы к нему из пула потоков.
+    #  Токен, подпись которого уже проверялась, повторно не декодируем
+    token_key = sha256(token.encode()).digest()
+    user = token_cache.get(token_key)
+    if user is not MISSING:
+        return dict(user)
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get('sub')
@@ -73,13 +104,15 @@ def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="No access token supplied"
             )
-        return {
+        user = {
             'username': username,
             'id': user_id,
             'is_admin': is_admin,
             'is_supplier': is_supplier,
             'is_customer': is_customer,
         }
+        token_cache.set(token_key, user, ttl=expire - time())
+        return dict(user)
     except ExpiredSignatureError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -111,32 +144,86 @@ def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
 
 #реализация аутентификации через JWT
 
-@router.get('/read_current_user')
+@router.get('/read_current_user', response_model=CurrentUser)
 async def read_current_user(user: User = Depends(get_current_user)):
     return user
 
 
-@router.post('/token')
+@router.post('/token', response_model=Tokens)
 async def login(db: Annotated[AsyncSession, Depends(get_db)],
                 form_data: Annotated[OAuth2PasswordRequestForm, Depends()]):
     user = await authenticate_user(db, form_data.username, form_data.password)
+    tokens = await issue_tokens(db, user)
+    await db.commit()
+    return tokens
+
+
+@router.post('/refresh', response_model=Tokens)
+async def refresh(db: Annotated[AsyncSession, Depends(get_db)], token_refresh: TokenRefresh):
+    #  один поиск по уникальному индексу token_hash сразу вместе с пользователем, без проверки пароля
+    found = (await db.execute(
+        select(RefreshToken, User).join(User, User.id == RefreshToken.user_id)
+        .where(RefreshToken.token_hash == hash_refresh_token(token_refresh.refresh_token))
+        .with_for_update(of=RefreshToken)
+    )).first()
+    if found is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token"
+        )
+    refresh_token, user = found
+
+    if not refresh_token.is_active:
+        if refresh_token.revoked_reason == ROTATED:
+            #  уже обменянный токен предъявлен повторно - вероятно, он украден;
+            #  отзываем все refresh-токены пользователя. Токен, отозванный при выходе, так не считается
+            await db.execute(update(RefreshToken)
+                             .where(RefreshToken.user_id == user.id, RefreshToken.is_active == True)
+                             .values(is_active=False, revoked_reason=REUSE))
+            await db.commit()
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token has been revoked"
+        )
+    if refresh_token.expires_at < datetime.now():
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token expired!"
+        )
+    if not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User is inactive"
+        )
+
+    #  ротация: старый токен гасится, клиент получает новую пару
+    await db.execute(update(RefreshToken).where(RefreshToken.id == refresh_token.id)
+                     .values(is_active=False, revoked_reason=ROTATED))
+    tokens = await issue_tokens(db, user)
+    await db.commit()
+    return tokens
 
-    token = create_access_token(user.username, user.id, user.is_admin, user.is_supplier, user.is_customer,
-                                expires_delta=timedelta(minutes=20))
 
+@router.post('/revoke', response_model=TransactionResult)
+async def revoke(db: Annotated[AsyncSession, Depends(get_db)], token_refresh: TokenRefresh):
+    await db.execute(update(RefreshToken)
+                     .where(RefreshToken.token_hash == hash_refresh_token(token_refresh.refresh_token),
+                            RefreshToken.is_active == True)
+                     .values(is_active=False, revoked_reason=LOGOUT))
+    await db.commit()
     return {
-        'access_token': token,
-        'token_type': 'bearer'
+        'status_code': status.HTTP_200_OK,
+        'transaction': 'Refresh token is revoked'
     }
 
 
-@router.post('/', status_code=status.HTTP_201_CREATED)
+@router.post('/', status_code=status.HTTP_201_CREATED, response_model=TransactionResult)
 async def create_user(db: Annotated[AsyncSession, Depends(get_db)], create_user: CreateUser):
     await db.execute(insert(User).values(first_name=create_user.first_name,
                                          last_name=create_user.last_name,
                                          username=create_user.username,
                                          email=create_user.email,
-                                         hashed_password=bcrypt_context.hash(create_user.password)))
+                                         hashed_password=await password_hasher.hash(create_user.password)))
     await db.commit()
     return {
         'status_code': status.HTTP_201_CREATED,
@@ -1,25 +1,34 @@
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, status, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Annotated
 from sqlalchemy import insert, select, update
 from slugify import slugify
 
-from app.backend.db_depends import get_db
-from app.schemas import CreateCategory
+from app.backend.db_depends import get_db, get_read_db
+from app.schemas import CreateCategory, CategoryOut, TransactionResult
 from app.models import *
 from app.routers.auth import get_current_user
+from app.services.category_cache import get_category_tree, refresh_category_tree
+from app.services.conditional import not_modified
+from app.services.versions import VersionStamp, bump_version
 
 router = APIRouter(prefix='/categories', tags=['category'])
 
 
-@router.get('/')
-async def get_all_categories(db: Annotated[AsyncSession, Depends(get_db)]):
-    categories = await db.scalars(select(Category).where(Category.is_active == True))
-    return categories.all()
+@router.get('/', response_model=list[CategoryOut])
+async def get_all_categories(db: Annotated[AsyncSession, Depends(get_read_db)],
+                             request: Request,
+                             response: Response):
+    #  версия берётся из снимка дерева в памяти: повторный запрос с актуальным ETag не обращается к БД
+    tree = await get_category_tree(db)
+    cached = not_modified(request, response, 'categories', VersionStamp(tree.version, tree.updated_at))
+    if cached is not None:
+        return cached
+    return tree.active()
 
 
-@router.post('/')
+@router.post('/', response_model=TransactionResult)
 async def create_category(db: Annotated[AsyncSession, Depends(get_db)],
                           create_category: CreateCategory,
                           get_user: Annotated[dict, Depends(get_current_user)]):
@@ -27,7 +36,9 @@ async def create_category(db: Annotated[AsyncSession, Depends(get_db)],
         await db.execute(insert(Category).values(name=create_category.name,
                                                  parent_id=create_category.parent_id,
                                                  slug=slugify(create_category.name)))
+        stamp = await bump_version(db, 'categories')
         await db.commit()
+        await refresh_category_tree(db, stamp)
         return {
             'status_code': status.HTTP_201_CREATED,
             'transaction': 'Successful'
@@ -38,7 +49,7 @@ async def create_category(db: Annotated[AsyncSession, Depends(get_db)],
     )
 
 
-@router.put('/')
+@router.put('/', response_model=TransactionResult)
 async def update_category(db: Annotated[AsyncSession, Depends(get_db)],
                           category_id: int,
                           update_category: CreateCategory,
@@ -55,7 +66,9 @@ async def update_category(db: Annotated[AsyncSession, Depends(get_db)],
             slug=slugify(update_category.name),
             parent_id=update_category.parent_id
         ))
+        stamp = await bump_version(db, 'categories')
         await db.commit()
+        await refresh_category_tree(db, stamp)
         return {
             "status_code": status.HTTP_200_OK,
             "transaction": "Category update is successful"
@@ -65,7 +78,7 @@ async def update_category(db: Annotated[AsyncSession, Depends(get_db)],
         detail='You must be admin user for this'
     )
 
-@router.delete('/')
+@router.delete('/', response_model=TransactionResult)
 async def delete_category(db: Annotated[AsyncSession, Depends(get_db)],
                           category_id: int,
                           get_user: Annotated[dict, Depends(get_current_user)]):
@@ -77,9 +90,11 @@ async def delete_category(db: Annotated[AsyncSession, Depends(get_db)],
                 detail="There is no category found"
             )
         await db.execute(update(Category).where(Category.id == category_id).values(is_active=False))
+        stamp = await bump_version(db, 'categories')
         await db.commit()
+        await refresh_category_tree(db, stamp)
         return {
-            'status code': status.HTTP_200_OK,
+            'status_code': status.HTTP_200_OK,
             'transaction': 'Category delete is successful'
         }
     raise HTTPException(
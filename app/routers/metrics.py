@@ -0,0 +1,54 @@
+from secrets import compare_digest
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+from app.backend.config import METRICS_TOKEN
+from app.backend.db import engine, read_engine, pool_status
+from app.routers.auth import get_current_user, oauth2_scheme
+from app.schemas import PoolMetrics
+from app.services import metrics
+from app.services.cache import product_detail_cache, token_cache
+from app.services.hashing import password_hasher
+
+
+
+async def metrics_access(token: Annotated[str, Depends(oauth2_scheme)]):
+    '''метрики раскрывают размеры пулов, задержки и число SQL-запросов по маршрутам, поэтому доступны
+    только сборщику со статическим токеном METRICS_TOKEN или администратору с access-токеном'''
+    if METRICS_TOKEN is not None and compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        return
+    if not (await get_current_user(token)).get('is_admin'):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail='You must be admin user for this'
+        )
+
+
+router = APIRouter(prefix='/metrics', tags=['metrics'], dependencies=[Depends(metrics_access)])
+
+
+def pool_series() -> list[tuple[dict, dict]]:
+    series = [({'engine': 'primary'}, pool_status(engine.pool))]
+    if read_engine is not engine:
+        series.append(({'engine': 'replica'}, pool_status(read_engine.pool)))
+    return series
+
+
+@router.get('', response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(
+        metrics.render_gauges('db_pool', 'Database connection pool', *pool_series()),
+        metrics.render_gauges('product_cache', 'Product detail cache', ({}, product_detail_cache.stats())),
+        metrics.render_gauges('token_cache', 'Verified access token cache', ({}, token_cache.stats())),
+        metrics.render_gauges('password_hasher', 'bcrypt thread pool', ({}, password_hasher.stats())),
+    ), media_type='text/plain; version=0.0.4')
+
+
+@router.get('/pool', response_model=PoolMetrics)
+async def pool_metrics():
+    return {
+        'primary': pool_status(engine.pool),
+        'replica': pool_status(read_engine.pool) if read_engine is not engine else None
+    }
@@ -7,11 +7,12 @@ from sqlalchemy import select, update
 from app.backend.db_depends import get_db
 from app.routers.auth import get_current_user
 from app.models.user import User
+from app.schemas import DetailResult
 
 
 router = APIRouter(prefix="/permission", tags=["permission"])
 
-@router.patch('/')
+@router.patch('/', response_model=DetailResult)
 async def supplier_permission(db: Annotated[AsyncSession, Depends(get_db)],
                               get_user: Annotated[dict, Depends(get_current_user)],
                               user_id: int):
@@ -27,13 +28,13 @@ async def supplier_permission(db: Annotated[AsyncSession, Depends(get_db)],
             await db.execute(update(User).where(User.id == user_id).values(is_supplier=False, is_customer=True))
             await db.commit()
             return {
-                'status code': status.HTTP_200_OK,
+                'status_code': status.HTTP_200_OK,
                 'detail': 'User is no longer supplier'
             }
         await db.execute(update(User).where(User.id == user_id).values(is_supplier=True, is_customer=False))
         await db.commit()
         return {
-            'status code': status.HTTP_200_OK,
+            'status_code': status.HTTP_200_OK,
             'detail': 'User is now supplier'
         }
     raise HTTPException(
@@ -42,7 +43,7 @@ async def supplier_permission(db: Annotated[AsyncSession, Depends(get_db)],
     )
 
 
-@router.delete('/delete')
+@router.delete('/delete', response_model=DetailResult)
 async def delete_user(db: Annotated[AsyncSession, Depends(get_db)], get_user: Annotated[dict, Depends(get_current_user)], user_id: int):
     if get_user.get('is_admin'):
         user = await db.scalar(select(User).where(User.id == user_id))
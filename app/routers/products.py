@@ -1,32 +1,95 @@
-from typing import Annotated
+import csv
+import io
+import json
+from typing import Annotated, Literal
 
-from fastapi import APIRouter, Depends, status, HTTPException
-from sqlalchemy import select, insert, update
+from fastapi import APIRouter, Depends, status, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import Float, select, update, func, literal_column
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from slugify import slugify
 
-from app.backend.db_depends import get_db
-from app.schemas import CreateProduct
+from app.backend.config import PAGE_SIZE, MAX_PAGE_SIZE, IMPORT_BATCH_SIZE, EXPORT_FETCH_SIZE
+from app.backend.db import read_session_maker
+from app.backend.db_depends import get_db, get_read_db
+from app.schemas import CreateProduct, ProductFilter, ProductOut, ProductDetail, ProductPage, TransactionResult, ImportResult
 from app.models import *
 from app.routers.auth import get_current_user
+from app.services.pagination import paginate
+from app.services.cache import product_detail_cache
+from app.services.category_cache import get_category_tree
+from app.services.conditional import not_modified
+from app.services.negotiation import negotiate, represent
+from app.services.importer import read_rows
+from app.services.rating_histogram import load_histogram
+from app.services.versions import bump_after_commit, get_version, product_resource, version_bump
 
 router = APIRouter(prefix='/products', tags=['products'])
 
+#  столбцы товара, которые отдаются клиентам (поля схемы ProductOut): служебные поля, поставщик
+#  и поисковый вектор из БД не читаются
+PRODUCT_COLUMNS = tuple(getattr(Product, field) for field in ProductOut.model_fields)
 
-@router.get('/')
-async def all_products(db: Annotated[AsyncSession, Depends(get_db)]):
-    products = await db.scalars(select(Product).where(Product.is_active == True,
-                                                      Product.stock > 0))
-    if products:
-        return products.all()
+#  условие "товар есть на складе"; 0 подставляется литералом, а не параметром,
+#  чтобы планировщик мог использовать частичные индексы с условием stock > 0
+IN_STOCK = Product.stock > literal_column('0')
 
-    raise HTTPException(
-        status_code=status.HTTP_404_NOT_FOUND,
-        detail="There are no product"
-    )
+#  столбцы товара в выгрузке каталога для партнёров
+EXPORT_COLUMNS = (Product.id, Product.name, Product.slug, Product.description, Product.price,
+                  Product.image_url, Product.stock, Product.rating, Product.category_id)
 
+#  ключи сортировки списков товаров: (столбцы ключа, по убыванию ли). Отдельного столбца с датой
+#  создания у товара нет: 'newest' - по убыванию id, который выдаётся последовательностью по порядку
+#  создания. price и rating допускают NULL - такие товары в сортировку по этим столбцам не попадают
+SORT_KEYS = {
+    'id': ((Product.id,), False),
+    'price': ((Product.price, Product.id), False),
+    '-price': ((Product.price, Product.id), True),
+    'rating': ((Product.rating, Product.id), False),
+    '-rating': ((Product.rating, Product.id), True),
+    'newest': ((Product.id,), True),
+}
 
-@router.post('/')
+
+def filter_products(query, filters: ProductFilter):
+    '''добавляет к запросу товаров <query> условия фильтра <filters>'''
+    query = query.where(Product.is_active == True)
+    if filters.in_stock:
+        query = query.where(IN_STOCK)
+    if filters.min_price is not None:
+        query = query.where(Product.price >= filters.min_price)
+    if filters.max_price is not None:
+        query = query.where(Product.price <= filters.max_price)
+    if filters.min_rating is not None:
+        query = query.where(Product.rating >= filters.min_rating)
+    if filters.supplier_id is not None:
+        query = query.where(Product.supplier_id == filters.supplier_id)
+    return query
+
+
+@router.get('/', response_model=ProductPage)
+async def all_products(db: Annotated[AsyncSession, Depends(get_read_db)],
+                       request: Request,
+                       response: Response,
+                       filters: Annotated[ProductFilter, Depends()],
+                       after: str | None = None,
+                       limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = PAGE_SIZE):
+    #  версия 'products' меняется при любой записи в товары и их рейтинги, поэтому совпавший ETag
+    #  означает неизменную страницу при любых фильтрах; вместо выборки - один запрос по первичному ключу.
+    #  JSON, MessagePack и NDJSON - разные представления, и у каждого свой ETag
+    cached = not_modified(request, response, 'products', await get_version(db, 'products'),
+                          negotiate(request.headers.get('accept', '')))
+    if cached is not None:
+        return cached
+    query = filter_products(select(*PRODUCT_COLUMNS), filters)
+    keys, descending = SORT_KEYS[filters.sort]
+    #  JSON по умолчанию, MessagePack или NDJSON - по заголовку Accept
+    return represent(request, response, await paginate(db, query, keys, after, limit, descending), ProductOut)
+
+
+@router.post('/', response_model=TransactionResult)
 async def create_product(db: Annotated[AsyncSession, Depends(get_db)],
                          create_product: CreateProduct,
                          get_user: Annotated[dict, Depends(get_current_user)]):
@@ -53,52 +116,173 @@ async def create_product(db: Annotated[AsyncSession, Depends(get_db)],
                                             slug=slugify(create_product.name),
                                             supplier_id=get_user.get("id")))
     await db.commit()
+    await bump_after_commit(db, 'products')
     return {
         'status_code': status.HTTP_201_CREATED,
         'transaction': 'Successful'
     }
 
 
-@router.get('/{category_slug}')
-async def product_by_category(db: Annotated[AsyncSession, Depends(get_db)],
-                              category_slug: str):
-    category = await db.scalar(select(Category).where(Category.slug == category_slug))
-    if category is None:
+@router.post('/import', response_model=ImportResult)
+async def import_products(db: Annotated[AsyncSession, Depends(get_db)],
+                          request: Request,
+                          get_user: Annotated[dict, Depends(get_current_user)]):
+    if not get_user.get("is_admin") and not get_user.get("is_supplier"):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="You are not authorized to use this method"
+        )
+
+    rows = read_rows(request.stream(), request.headers.get('content-type', ''))
+    category_ids = (await get_category_tree(db)).nodes.keys()
+    errors = []
+    inserted = 0
+    slugs = set()  # слаги, уже встреченные в этой загрузке
+    batch = []  # пары (номер строки, значения товара)
+
+    async def write_batch():
+        #  пачка вставляется многострочными INSERT (insertmanyvalues) с одним коммитом; строки с уже занятым слагом пропускаются
+        nonlocal inserted
+        written = await db.scalars(insert(Product)
+                                   .on_conflict_do_nothing(index_elements=[Product.slug])
+                                   .returning(Product.slug),
+                                   [values for _, values in batch])
+        written = set(written.all())
+        await db.commit()
+        await bump_after_commit(db, 'products')
+        inserted += len(written)
+        errors.extend({'row': row_number, 'errors': ['slug: product already exists']}
+                      for row_number, values in batch if values['slug'] not in written)
+        batch.clear()
+
+    async for row_number, row in rows:
+        if row is None:
+            errors.append({'row': row_number, 'errors': ['Row could not be parsed']})
+            continue
+        try:
+            product = CreateProduct.model_validate(row)
+        except ValidationError as exc:
+            errors.append({'row': row_number,
+                           'errors': [f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in exc.errors()]})
+            continue
+        if product.category not in category_ids:
+            errors.append({'row': row_number, 'errors': ['category: There is no category found']})
+            continue
+        slug = slugify(product.name)
+        if slug in slugs:
+            errors.append({'row': row_number, 'errors': ['slug: duplicated in this upload']})
+            continue
+        slugs.add(slug)
+
+        batch.append((row_number, {'name': product.name,
+                                   'description': product.description,
+                                   'price': product.price,
+                                   'image_url': product.image_url,
+                                   'stock': product.stock,
+                                   'category_id': product.category,
+                                   'slug': slug,
+                                   'supplier_id': get_user.get("id")}))
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await write_batch()
+
+    if batch:
+        await write_batch()
+    errors.sort(key=lambda error: error['row'])
+
+    return {
+        'status_code': status.HTTP_201_CREATED,
+        'transaction': 'Successful' if not errors else 'Completed with errors',
+        'inserted': inserted,
+        'errors': errors
+    }
+
+
+@router.get('/export')
+async def export_products(format: Literal['ndjson', 'csv'] = 'ndjson'):
+    query = (select(*EXPORT_COLUMNS)
+             .where(Product.is_active == True, IN_STOCK)
+             .order_by(Product.id)
+             .execution_options(yield_per=EXPORT_FETCH_SIZE))
+
+    async def export_rows():
+        #  своя сессия живёт, пока отдаётся ответ; строки читаются из серверного курсора
+        #  пачками по EXPORT_FETCH_SIZE, поэтому память не зависит от размера каталога
+        async with read_session_maker() as session:
+            result = await session.stream(query)
+            if format == 'csv':
+                yield ','.join(column.key for column in EXPORT_COLUMNS) + '\r\n'
+            async for rows in result.partitions():
+                if format == 'csv':
+                    buffer = io.StringIO()
+                    csv.writer(buffer).writerows(rows)
+                    yield buffer.getvalue()
+                else:
+                    yield ''.join(json.dumps(dict(row._mapping), ensure_ascii=False) + '\n' for row in rows)
+
+    media_type = 'text/csv' if format == 'csv' else 'application/x-ndjson'
+    return StreamingResponse(export_rows(), media_type=media_type,
+                             headers={'Content-Disposition': f'attachment; filename="products.{format}"'})
+
+
+@router.get('/search', response_model=ProductPage)
+async def search_products(db: Annotated[AsyncSession, Depends(get_read_db)],
+                          q: Annotated[str, Query(min_length=1)],
+                          after: str | None = None,
+                          limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = PAGE_SIZE):
+    #  поиск по GIN-индексу поискового вектора, самые релевантные товары - первыми
+    search_query = func.websearch_to_tsquery('simple', q)
+    rank = func.ts_rank(Product.search_vector, search_query, type_=Float)
+    query = select(*PRODUCT_COLUMNS).where(Product.search_vector.op('@@')(search_query),
+                                  Product.is_active == True,
+                                  IN_STOCK)
+    return await paginate(db, query, (rank, Product.id), after, limit, descending=True)
+
+
+@router.get('/{category_slug}', response_model=ProductPage)
+async def product_by_category(db: Annotated[AsyncSession, Depends(get_read_db)],
+                              category_slug: str,
+                              filters: Annotated[ProductFilter, Depends()],
+                              after: str | None = None,
+                              limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = PAGE_SIZE):
+    tree = await get_category_tree(db)
+    category_id = tree.slugs.get(category_slug)
+    if category_id is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Category not found"
         )
-    subcategories = await db.scalars(select(Category).where(Category.parent_id == category.id))
-    cat_ids = [category.id] + [cat.id for cat in subcategories.all()]
-
-    products = await db.scalars(select(Product).where(Product.category_id.in_(cat_ids),
-                                                      Product.is_active == True,
-                                                      Product.stock > 0
-                                                      ))
-    if products:
-        return products.all()
-    raise HTTPException(
-        status_code=status.HTTP_404_NOT_FOUND,
-        detail="There are no active product on stock"
-    )
-
-
-@router.get('/detail/{product_slug}')
+    query = filter_products(select(*PRODUCT_COLUMNS).where(Product.category_id.in_(tree.descendants[category_id])),
+                            filters)
+    keys, descending = SORT_KEYS[filters.sort]
+    return await paginate(db, query, keys, after, limit, descending)
+
+
+@router.get('/detail/{product_slug}', response_model=ProductDetail)
 async def product_detail(db: Annotated[AsyncSession, Depends(get_db)],
                          product_slug: str):
-    product = await db.scalar(select(Product).where(Product.slug == product_slug,
-                                                    Product.is_active == True,
-                                                    Product.stock > 0))
-    if product:
-        return product
+    #  карточка читается с основной БД: она попадает в общий кэш, и отстающая реплика
+    #  могла бы закэшировать уже изменённый товар на всё время жизни записи.
+    #  Ключ кэша - слаг и версия товара: запись и отзывы в любом процессе сдвигают версию,
+    #  поэтому устаревшая карточка не отдаётся ни одним воркером (одно чтение по первичному ключу)
+    version = (await get_version(db, product_resource(product_slug))).version
+
+    async def load_product():
+        product = await db.execute(select(*PRODUCT_COLUMNS).where(Product.slug == product_slug,
+                                                                  Product.is_active == True,
+                                                                  IN_STOCK))
+        product = product.mappings().first()
+        if product:
+            return {**product, 'rating_histogram': await load_histogram(db, product['id'])}
+
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="There are no product"
+        )
 
-    raise HTTPException(
-        status_code=status.HTTP_404_NOT_FOUND,
-        detail="There are no product"
-    )
+    return await product_detail_cache.get_or_load((product_slug, version), load_product)
 
 
-@router.put('/{product_slug}')
+@router.put('/{product_slug}', response_model=TransactionResult)
 async def update_product(db: Annotated[AsyncSession, Depends(get_db)],
                          upd_product: CreateProduct,
                          product_slug: str,
@@ -128,9 +312,12 @@ async def update_product(db: Annotated[AsyncSession, Depends(get_db)],
                                                                                 price=upd_product.price,
                                                                                 image_url=upd_product.image_url,
                                                                                 stock=upd_product.stock,
-                                                                                rating=0.0,
-                                                                                category_id=upd_product.category))
+                                                                                category_id=upd_product.category)
+                     #  у карточки и отзывов товара меняется адрес, поэтому версия сдвигается и по старому, и по новому слагу
+                     .add_cte(version_bump(product_resource(product_slug),
+                                           product_resource(slugify(upd_product.name))).cte('versions')))
     await db.commit()
+    await bump_after_commit(db, 'products')
     return {
         'status_code': status.HTTP_200_OK,
         'transaction': 'Product update is successful'
@@ -138,7 +325,7 @@ async def update_product(db: Annotated[AsyncSession, Depends(get_db)],
 
 
 
-@router.delete('/')
+@router.delete('/', response_model=TransactionResult)
 async def delete_product(db: Annotated[AsyncSession, Depends(get_db)],
                          product_id: int,
                          get_user: Annotated[dict, Depends(get_current_user)]):
@@ -155,8 +342,10 @@ async def delete_product(db: Annotated[AsyncSession, Depends(get_db)],
             status_code=status.HTTP_404_NOT_FOUND,
             detail="There is no product found"
         )
-    await db.execute(update(Product).where(Product.id == product_id).values(is_active=False))
+    await db.execute(update(Product).where(Product.id == product_id).values(is_active=False)
+                     .add_cte(version_bump(product_resource(product.slug)).cte('versions')))
     await db.commit()
+    await bump_after_commit(db, 'products')
     return {
         'status_code': status.HTTP_200_OK,
         'transaction': 'Product delete is successful'
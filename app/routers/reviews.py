@@ -1,61 +1,89 @@
 from typing import Annotated
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, status, HTTPException
-from sqlalchemy import update
+from fastapi import APIRouter, Depends, status, HTTPException, Query, Request, Response
+from sqlalchemy import func, literal, select, true, union_all, update
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
-from app.backend.db_depends import get_db
-from app.schemas import CreateReview
+from app.backend.config import PAGE_SIZE, MAX_PAGE_SIZE
+from app.backend.db_depends import get_db, get_read_db
+from app.schemas import CreateReview, ReviewPage, ProductReviewOut, ProductReviewPage, TransactionResult
 from app.models import User, Product, Review, Rating
 from .auth import get_current_user
-from app.services.service import update_rating, get_object_or_404, get_objects_or_404
+from app.services.service import rating_update, get_object_or_404
+from app.services.rating_histogram import histogram_upsert
+from app.services.pagination import paginate
+from app.services.conditional import not_modified
+from app.services.negotiation import represent
+from app.services.versions import bump_after_commit, get_version, product_resource, version_bump
 
 router = APIRouter(prefix='/reviews', tags=['reviews'])
 
 
-@router.get('/')
-async def all_reviews(db: Annotated[AsyncSession, Depends(get_db)]):
-    reviews = await get_objects_or_404(db, Review, (Review.is_active == True,))
-
-    #  Получаем список всех отзывов со связвнными с ними объектами товаров, пользователей и рейтингов
-    objects = [
-        {'review': review,
-         'product': await get_object_or_404(db, Product, (Product.id == review.product_id,)),
-         'user': await get_object_or_404(db, User, (User.id == review.user_id,)),
-         'rating': await get_object_or_404(db, Rating, (Rating.id == review.rating_id,))}
-        for review in reviews]
-
-    return [{'product_slug': obj['product'].slug,
-             'user': obj['user'].username,
-             'comment_date': obj['review'].comment_date,
-             'comment': obj['review'].comment,
-             'rating': obj['rating'].grade} for obj in objects]
-
-
-
-@router.get('/{product_slug}')
-async def products_reviews(db: Annotated[AsyncSession, Depends(get_db)],
-                           product_slug: str):
-    product = await get_object_or_404(db, Product, (Product.slug == product_slug, Product.is_active == True))
-    reviews = await get_objects_or_404(db, Review, (Review.product_id == product.id, Review.is_active == True))
-
-    #  Получаем список отзывов по товару со связвнными с ними объектами пользователей и рейтингов
-    objects = [
-        {'review': review,
-         'user': await get_object_or_404(db, User, (User.id == review.user_id,)),
-         'rating': await get_object_or_404(db, Rating, (Rating.id == review.rating_id,))}
-        for review in reviews]
-
-    return [{'user': obj['user'].username,
-             'comment_date': obj['review'].comment_date,
-             'comment': obj['review'].comment,
-             'rating': obj['rating'].grade} for obj in objects]
+#  столбцы отзыва, которые попадают в ответ
+REVIEW_COLUMNS = (User.username.label('user'),
+                  Review.comment_date,
+                  Review.comment,
+                  Rating.grade.label('rating'))
+
+
+def reviews_query(*columns):
+    '''запрос активных отзывов, соединённых с товарами, пользователями и оценками, —
+    выбирает только столбцы ответа <columns> + REVIEW_COLUMNS за одно обращение к БД'''
+    return (select(*columns, *REVIEW_COLUMNS)
+            .select_from(Review)
+            .join(Product, Product.id == Review.product_id)
+            .join(User, User.id == Review.user_id)
+            .join(Rating, Rating.id == Review.rating_id)
+            .where(Review.is_active == True))
+
+
+@router.get('/', response_model=ProductReviewPage)
+async def all_reviews(db: Annotated[AsyncSession, Depends(get_read_db)],
+                      request: Request,
+                      response: Response,
+                      after: str | None = None,
+                      limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = PAGE_SIZE):
+    #  страница - диапазон по первичному ключу отзывов, стоимость не зависит от размера таблицы;
+    #  JSON по умолчанию, MessagePack или NDJSON - по заголовку Accept
+    page = await paginate(db, reviews_query(Product.slug.label('product_slug')), (Review.id,), after, limit)
+    if not page['items'] and after is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Reviews are not found"
+        )
+    return represent(request, response, page, ProductReviewOut)
+
+
+@router.get('/{product_slug}', response_model=ReviewPage)
+async def products_reviews(db: Annotated[AsyncSession, Depends(get_read_db)],
+                           request: Request,
+                           response: Response,
+                           product_slug: str,
+                           grade: Annotated[int | None, Query(ge=0, le=5)] = None,
+                           after: str | None = None,
+                           limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = PAGE_SIZE):
+    #  отзывы товара версионируются по его слагу: при неизменной версии - 304 без выборки отзывов
+    cached = not_modified(request, response, 'reviews', await get_version(db, product_resource(product_slug)))
+    if cached is not None:
+        return cached
+
+    #  новые отзывы первыми; страница - диапазон по индексу ix_reviews_product_date
+    query = reviews_query().where(Product.slug == product_slug, Product.is_active == True)
+    if grade is not None:
+        query = query.where(Rating.grade == grade)
+    page = await paginate(db, query, (Review.comment_date, Review.id), after, limit, descending=True)
+    if not page['items'] and after is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Reviews are not found"
+        )
+    return page
 
 
-@router.post('/{product_slug}')
+@router.post('/{product_slug}', response_model=TransactionResult)
 async def add_review(db: Annotated[AsyncSession, Depends(get_db)],
                      product_slug: str,
                      review: CreateReview,
@@ -67,43 +95,58 @@ async def add_review(db: Annotated[AsyncSession, Depends(get_db)],
             detail="Only customers can leave reviews"
         )
 
-    #  получаем из базы данных объект товара по слагу
-    product = await get_object_or_404(db, Product, (Product.slug == product_slug, Product.is_active == True))
-
-    #  значения полей нового рейтинга для занесения в БД
-    new_rating = {'grade': review.rating_grade,
-                  'user_id': get_user.get('id'),
-                  'product_id': product.id}
-
-    #  Запись с рейтингом либо заносится впервые, либо обновляется при наличии в БД и при совпадении пользователя и товара
-    await db.execute(
-        insert(Rating).values(new_rating).on_conflict_do_update(constraint='uc_rating_user_product',
-                                                                set_={'grade': new_rating['grade'],
-                                                                      'is_active': True}))
-    await db.commit()
-
-    #  Получаем объект рейтинга из БД
-    rating = await get_object_or_404(db, Rating,
-                                     (Rating.user_id == get_user.get('id'), Rating.product_id == product.id))
-
-    #  значения полей нового отзыва для занесения в БД
-    new_review = {'comment': review.comment,
-                  'user_id': get_user.get('id'),
-                  'product_id': product.id,
-                  'rating_id': rating.id}
-
-    #  Запись с отзывом либо заносится впервые, либо обновляется при наличии в БД и при совпадении пользователя и товара
-    await db.execute(
-        insert(Review).values(new_review).on_conflict_do_update(constraint='uc_review_user_product',
-                                                                set_={'comment': new_review['comment'],
-                                                                      'rating_id': new_review['rating_id'],
-                                                                      'comment_date': datetime.now(),
-                                                                      'is_active': True})
-    )
+    #  получаем товар по слагу и блокируем его строку до конца транзакции,
+    #  чтобы параллельные отзывы на этот товар обновляли его рейтинг по очереди
+    found = (await db.execute(select(Product.id, Product.slug)
+                              .where(Product.slug == product_slug, Product.is_active == True)
+                              .with_for_update())).first()
+    if found is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Object is not found"
+        )
+    product_id, slug = found
+
+    #  Запись с рейтингом либо заносится впервые, либо обновляется при совпадении пользователя и товара;
+    #  её id сразу из RETURNING попадает в отзыв
+    rating = (insert(Rating)
+              .values(grade=review.rating_grade, user_id=get_user.get('id'), product_id=product_id,
+                      is_active=True)
+              .on_conflict_do_update(constraint='uc_rating_user_product',
+                                     set_={'grade': review.rating_grade, 'is_active': True})
+              .returning(Rating.id)
+              .cte('rating'))
+
+    #  Запись с отзывом либо заносится впервые, либо обновляется при совпадении пользователя и товара
+    new_review = insert(Review).from_select(
+        ['comment', 'user_id', 'product_id', 'rating_id', 'comment_date', 'is_active'],
+        select(literal(review.comment), literal(get_user.get('id')), literal(product_id), rating.c.id,
+               literal(datetime.now()), true()))
+    new_review = (new_review
+                  .on_conflict_do_update(constraint='uc_review_user_product',
+                                         set_={'comment': new_review.excluded.comment,
+                                               'rating_id': new_review.excluded.rating_id,
+                                               'comment_date': new_review.excluded.comment_date,
+                                               'is_active': True})
+                  .returning(Review.id)
+                  .cte('review'))
+
+    #  прежняя активная оценка пользователя читается подзапросами того же UPDATE: они видят данные
+    #  до вставок из CTE, а снимок запроса берётся уже после блокировки товара. При повторной оценке
+    #  меняется только сумма, при новой - ещё и количество. Вся запись отзыва - один запрос к БД
+    old_rating = (Rating.user_id == get_user.get('id'), Rating.product_id == product_id, Rating.is_active == True)
+    old_grade = select(func.coalesce(func.sum(Rating.grade), 0)).where(*old_rating).scalar_subquery()
+    old_count = select(func.count()).where(*old_rating).scalar_subquery()
+    #  гистограмма: +1 к новой оценке и -1 к прежней (при той же оценке изменения взаимно гасятся)
+    histogram = histogram_upsert(product_id, union_all(select(literal(review.rating_grade), literal(1)),
+                                                       select(Rating.grade, literal(-1)).where(*old_rating)))
+    #  версия товара (карточка и отзывы) сдвигается тем же запросом - строка товара уже заблокирована;
+    #  общая версия списков товаров (в них есть рейтинг) - после коммита, вне блокировки
+    versions = version_bump(product_resource(slug))
+    await db.execute(rating_update(product_id, review.rating_grade - old_grade, 1 - old_count)
+                     .add_cte(rating, new_review, histogram.cte('histogram'), versions.cte('versions')))
     await db.commit()
-
-    #  обновляем рейтинг товара в БД
-    await update_rating(db, product.id)
+    await bump_after_commit(db, 'products')
 
     #  возвращаем сообщение об успешном размещении отзыва
     return {
@@ -112,7 +155,7 @@ async def add_review(db: Annotated[AsyncSession, Depends(get_db)],
     }
 
 
-@router.delete('/{product_slug}')
+@router.delete('/{product_slug}', response_model=TransactionResult)
 async def delete_reviews(db: Annotated[AsyncSession, Depends(get_db)],
                          product_slug: str,
                          review_id: int,
@@ -124,19 +167,32 @@ async def delete_reviews(db: Annotated[AsyncSession, Depends(get_db)],
             detail="Only admin can delete review"
         )
 
-    #  получаем из базы данных объект товара по слагу
-    product = await get_object_or_404(db, Product, (Product.slug == product_slug, Product.is_active == True))
+    #  получаем из базы данных объект товара по слагу и блокируем его строку до конца транзакции
+    product = await db.scalar(select(Product).where(Product.slug == product_slug,
+                                                    Product.is_active == True).with_for_update())
+    if product is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Object is not found"
+        )
 
     #  получаем из базы данных объект отзыва по идентификатору
-    review = await get_object_or_404(db, Review, (Review.id == review_id, Review.is_active == True))
+    review = await get_object_or_404(db, Review, (Review.id == review_id,
+                                                  Review.product_id == product.id,
+                                                  Review.is_active == True))
+    rating = await db.scalar(select(Rating).where(Rating.id == review.rating_id))
 
     #  деактивируем отзыв и соответствующую отметку рейтинга
-    await db.execute(update(Review).where(Review.id == review_id).values(is_active=False))
-    await db.execute(update(Rating).where(Rating.id == review.rating_id).values(is_active=False))
+    await db.execute(update(Review).where(Review.id == review_id).values(is_active=False)
+                     .add_cte(version_bump(product_resource(product.slug)).cte('versions')))
+    if rating is not None and rating.is_active:
+        await db.execute(update(Rating).where(Rating.id == rating.id).values(is_active=False))
+
+        #  убираем оценку из рейтинга и гистограммы товара
+        histogram = histogram_upsert(product.id, select(literal(rating.grade), literal(-1)))
+        await db.execute(rating_update(product.id, -rating.grade, -1).add_cte(histogram.cte('histogram')))
     await db.commit()
-
-    #  обновляем рейтинг товара в БД
-    await update_rating(db, product.id)
+    await bump_after_commit(db, 'products')
 
     #  возвращаем сообщение об успешном удалении отзыва
     return {
@@ -1,3 +1,6 @@
+from datetime import datetime
+from typing import Literal
+
 from pydantic import BaseModel, Field
 
 
@@ -25,4 +28,115 @@ class CreateUser(BaseModel):
 
 class CreateReview(BaseModel):
     rating_grade: int = Field(0, ge=0, le=5)
-    comment: str
\ No newline at end of file
+    comment: str
+
+
+class TokenRefresh(BaseModel):
+    refresh_token: str
+
+
+class ProductFilter(BaseModel):
+    min_price: int | None = Field(None, ge=0)
+    max_price: int | None = Field(None, ge=0)
+    min_rating: float | None = Field(None, ge=0, le=5)
+    supplier_id: int | None = None
+    in_stock: bool = True
+    sort: Literal['id', 'price', '-price', 'rating', '-rating', 'newest'] = 'id'
+
+class TransactionResult(BaseModel):
+    status_code: int
+    transaction: str
+
+
+class DetailResult(BaseModel):
+    status_code: int
+    detail: str
+
+
+class ImportRowError(BaseModel):
+    row: int
+    errors: list[str]
+
+
+class ImportResult(TransactionResult):
+    inserted: int
+    errors: list[ImportRowError]
+
+
+class ProductOut(BaseModel):
+    id: int
+    name: str
+    slug: str
+    description: str | None
+    price: int | None
+    image_url: str | None
+    stock: int
+    rating: float | None
+    category_id: int
+
+
+class ProductDetail(ProductOut):
+    rating_histogram: dict[int, int]  # оценка -> количество активных оценок
+
+
+class ProductPage(BaseModel):
+    items: list[ProductOut]
+    next: str | None
+
+
+class CategoryOut(BaseModel):
+    id: int
+    name: str
+    slug: str
+    parent_id: int | None
+
+
+class ReviewOut(BaseModel):
+    user: str
+    comment_date: datetime
+    comment: str
+    rating: int
+
+
+class ReviewPage(BaseModel):
+    items: list[ReviewOut]
+    next: str | None
+
+
+class ProductReviewOut(ReviewOut):
+    product_slug: str
+
+
+class ProductReviewPage(BaseModel):
+    items: list[ProductReviewOut]
+    next: str | None
+
+
+class Tokens(BaseModel):
+    access_token: str
+    refresh_token: str
+    token_type: str
+
+
+class CurrentUser(BaseModel):
+    username: str
+    id: int
+    is_admin: bool
+    is_supplier: bool
+    is_customer: bool
+
+
+class PoolStatus(BaseModel):
+    size: int
+    checked_out: int
+    idle: int
+    overflow: int
+    max_overflow: int
+    checkouts: int
+    wait_seconds: float
+    max_wait_seconds: float
+
+
+class PoolMetrics(BaseModel):
+    primary: PoolStatus
+    replica: PoolStatus | None
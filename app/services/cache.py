@@ -0,0 +1,108 @@
+import asyncio
+from collections import OrderedDict
+from time import monotonic
+from typing import Awaitable, Callable
+
+from app.backend.config import PRODUCT_CACHE_SIZE, PRODUCT_CACHE_TTL, TOKEN_CACHE_SIZE
+
+MISSING = object()
+#  результат загрузки, отменённой вместе с запросом, который её выполнял
+RETRY = object()
+
+
+class LRUCache:
+    '''ограниченный по размеру кэш с вытеснением давно не использованных записей и временем жизни записей
+
+    Параллельные промахи по одному ключу в get_or_load объединяются: загрузку выполняет первый
+    запрос, остальные дожидаются его результата. Если первый запрос отменён (клиент отключился),
+    отмена ожидающим не передаётся: они повторяют загрузку своими загрузчиками.
+
+    Кэш не потокобезопасен: обращаться к нему можно только из цикла событий (async-эндпоинты
+    и зависимости), но не из синхронных функций, которые FastAPI выполняет в пуле потоков.
+    '''
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()  # ключ -> (момент истечения, значение)
+        self._pending = {}  # ключ -> future загрузки, которая сейчас выполняется
+
+    def get(self, key):
+        item = self._data.get(key)
+        if item is not None:
+            expires, value = item
+            if expires > monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._data[key]
+        self.misses += 1
+        return MISSING
+
+    def set(self, key, value, ttl: float | None = None):
+        self._data[key] = (monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, *keys):
+        for key in keys:
+            self._data.pop(key, None)
+            #  результат уже идущей загрузки мог устареть - он не попадёт в кэш
+            self._pending.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+        self._pending.clear()
+
+    async def get_or_load(self, key, loader: Callable[[], Awaitable]):
+        value = self.get(key)
+        if value is not MISSING:
+            return value
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            value = await asyncio.shield(pending)
+            if value is RETRY:
+                return await self.get_or_load(key, loader)
+            return value
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            #  отменён только этот запрос; запись о загрузке снимается до пробуждения ожидающих,
+            #  поэтому первый из них начнёт новую загрузку, а остальные присоединятся к ней
+            if self._pending.get(key) is future:
+                del self._pending[key]
+            future.set_result(RETRY)
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            future.exception()  # ошибку получат ожидающие запросы, если они есть
+            raise
+        else:
+            if self._pending.get(key) is future:
+                self.set(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+
+    def stats(self) -> dict:
+        return {'size': len(self._data), 'maxsize': self.maxsize,
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+#   кэш сериализованных карточек товаров по слагу и версии товара (см. product_resource)
+product_detail_cache = LRUCache(PRODUCT_CACHE_SIZE, PRODUCT_CACHE_TTL)
+
+#   кэш данных пользователя из уже проверенных access-токенов по их sha256;
+#   каждая запись живёт до истечения срока действия своего токена
+token_cache = LRUCache(TOKEN_CACHE_SIZE, 0)
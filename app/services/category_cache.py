@@ -0,0 +1,100 @@
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime
+from time import monotonic
+from types import MappingProxyType
+from typing import Mapping
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.backend.config import CATEGORY_CACHE_TTL
+from app.models import Category
+from app.services.versions import VersionStamp, get_version
+
+
+@dataclass(frozen=True)
+class CategoryNode:
+    id: int
+    name: str
+    slug: str
+    is_active: bool
+    parent_id: int | None
+
+
+@dataclass(frozen=True)
+class CategoryTree:
+    '''неизменяемый снимок дерева категорий версии <version>, изменённой в <updated_at>'''
+    version: int
+    updated_at: datetime | None
+    nodes: Mapping[int, CategoryNode]  # id -> категория
+    slugs: Mapping[str, int]  # slug -> id
+    descendants: Mapping[int, frozenset[int]]  # id -> id самой категории и всех её потомков
+
+    def active(self) -> list[CategoryNode]:
+        return [node for node in self.nodes.values() if node.is_active]
+
+
+_tree: CategoryTree | None = None
+_checked_at = 0.0
+_lock = asyncio.Lock()
+
+
+async def build_category_tree(db: AsyncSession, stamp: VersionStamp) -> CategoryTree:
+    '''корутина читает все категории одним запросом и строит по ним снимок дерева'''
+    categories = await db.execute(select(Category.id, Category.name, Category.slug,
+                                         Category.is_active, Category.parent_id).order_by(Category.id))
+    nodes = {row.id: CategoryNode(*row) for row in categories}
+
+    children = {}
+    for node in nodes.values():
+        children.setdefault(node.parent_id, []).append(node.id)
+
+    descendants = {}
+    for category_id in nodes:
+        subtree = {category_id}
+        stack = [category_id]
+        while stack:
+            for child_id in children.get(stack.pop(), ()):
+                if child_id not in subtree:  # защита от циклов в parent_id
+                    subtree.add(child_id)
+                    stack.append(child_id)
+        descendants[category_id] = frozenset(subtree)
+
+    return CategoryTree(version=stamp.version,
+                        updated_at=stamp.updated_at,
+                        nodes=MappingProxyType(nodes),
+                        slugs=MappingProxyType({node.slug: node.id for node in nodes.values()}),
+                        descendants=MappingProxyType(descendants))
+
+
+async def get_category_tree(db: AsyncSession) -> CategoryTree:
+    '''корутина возвращает снимок дерева категорий из памяти процесса
+
+    Не чаще раза в CATEGORY_CACHE_TTL секунд сверяет версию снимка с версией 'categories' в БД,
+    чтобы заметить изменения, сделанные другими процессами, и перестраивает снимок, если версия в БД
+    новее. Сессия <db> может быть на отстающей реплике: более старая версия оттуда не заменяет снимок,
+    который refresh_category_tree уже построил по основной БД. В остальное время обращений к БД нет.
+    '''
+    global _tree, _checked_at
+
+    if _tree is not None and monotonic() - _checked_at < CATEGORY_CACHE_TTL:
+        return _tree
+
+    async with _lock:
+        if _tree is None or monotonic() - _checked_at >= CATEGORY_CACHE_TTL:
+            stamp = await get_version(db, 'categories')
+            if _tree is None or _tree.version < stamp.version:
+                _tree = await build_category_tree(db, stamp)
+            _checked_at = monotonic()
+    return _tree
+
+
+async def refresh_category_tree(db: AsyncSession, stamp: VersionStamp):
+    '''корутина перестраивает снимок после записи в категории, закоммиченной с версией <stamp>'''
+    global _tree, _checked_at
+
+    async with _lock:
+        if _tree is None or _tree.version < stamp.version:
+            _tree = await build_category_tree(db, stamp)
+            _checked_at = monotonic()
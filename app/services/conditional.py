@@ -0,0 +1,78 @@
+'''Условные GET-запросы: ETag и Last-Modified по версиям ресурсов из resource_versions.
+
+Клиент, у которого уже есть ответ, присылает его ETag в If-None-Match; если версия ресурса
+не изменилась, эндпоинт отвечает 304 без основного запроса к БД и сериализации.
+'''
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response, status
+
+from app.services.versions import VersionStamp
+
+#  ответ можно хранить, но перед использованием клиент обязан сверить его с сервером
+CACHE_CONTROL = 'no-cache'
+
+
+def validators(name: str, stamp: VersionStamp, media_type: str | None = None) -> dict:
+    '''заголовки ETag, Last-Modified и Cache-Control для версии <stamp> ресурса <name>
+    в представлении <media_type> (None - у ресурса одно представление)
+
+    ETag слабый: ответы одной версии совпадают по смыслу, но могут различаться побайтно
+    (сжатие, порядок ключей), а сравнение в If-None-Match всё равно слабое. Разные форматы
+    одной версии - разные представления, поэтому формат входит в тег.
+    '''
+    tag = f'{name}-{stamp.version}'
+    if media_type is not None:
+        tag += '-' + media_type.rsplit('/', 1)[-1].removeprefix('x-')
+    headers = {'ETag': f'W/"{tag}"', 'Cache-Control': CACHE_CONTROL}
+    if stamp.updated_at is not None:
+        #  updated_at хранится в локальном времени сервера без зоны
+        headers['Last-Modified'] = format_datetime(stamp.updated_at.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+
+def is_fresh(request: Request, headers: dict) -> bool:
+    '''копия клиента совпадает с текущей версией: по If-None-Match, а If-Modified-Since -
+    только для ресурса без ETag
+
+    Last-Modified точен до секунды: вторая запись в ту же секунду не сдвинула бы дату,
+    и по If-Modified-Since клиент получил бы 304 на устаревшую копию. Версия в ETag
+    меняется при каждой записи, поэтому при наличии ETag сверяется только он.
+    '''
+    if 'ETag' in headers:
+        if_none_match = request.headers.get('if-none-match')
+        if if_none_match is None:
+            return False
+        etag = headers['ETag'].removeprefix('W/')
+        return any(tag == '*' or tag.removeprefix('W/') == etag
+                   for tag in (tag.strip() for tag in if_none_match.split(',')))
+
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since is None or 'Last-Modified' not in headers:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False  # некорректную дату стандарт велит игнорировать
+    if since.tzinfo is None:
+        return False
+    return parsedate_to_datetime(headers['Last-Modified']) <= since
+
+
+def not_modified(request: Request, response: Response, name: str, stamp: VersionStamp,
+                 media_type: str | None = None) -> Response | None:
+    '''возвращает ответ 304, если у клиента актуальная версия <stamp> ресурса <name>
+    в согласованном формате <media_type>; иначе добавляет валидаторы в заголовки будущего
+    ответа <response> и возвращает None
+
+    304 заменяет ответ 200 в кэшах, поэтому несёт и его Vary: Accept-Encoding (тело могло быть
+    сжато) и Accept, если формат выбирался по нему. У ответа 200 Vary выставляют represent()
+    и сжатие, когда действительно выбирают формат или кодировку.
+    '''
+    headers = validators(name, stamp, media_type)
+    if is_fresh(request, headers):
+        vary = 'Accept, Accept-Encoding' if media_type is not None else 'Accept-Encoding'
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={**headers, 'Vary': vary})
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,75 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from app.backend.config import BCRYPT_WORKERS, BCRYPT_QUEUE_LIMIT
+
+bcrypt_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
+
+
+class PasswordHasher:
+    '''выполняет хеширование и проверку паролей bcrypt в отдельном пуле потоков, не блокируя цикл событий
+
+    Одновременно считается не больше <workers> паролей, ещё до <queue_limit> запросов ждут в очереди;
+    сверх этого запрос сразу получает 503, а не копится в памяти.
+    '''
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.in_flight = 0  # запросы в работе и в очереди
+        self.calls = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0  # суммарное время ожидания свободного потока
+        self.hash_seconds = 0.0  # суммарное время работы bcrypt
+        self.max_hash_seconds = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+
+    def _timed(self, func, *args):
+        started = perf_counter()
+        return func(*args), started, perf_counter()
+
+    async def _run(self, func, *args):
+        if self.in_flight >= self.workers + self.queue_limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service is busy, try again later",
+                headers={"Retry-After": "1"},
+            )
+
+        self.in_flight += 1
+        queued = perf_counter()
+        try:
+            result, started, finished = await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._timed, func, *args)
+        finally:
+            self.in_flight -= 1
+
+        self.calls += 1
+        self.wait_seconds += started - queued
+        self.hash_seconds += finished - started
+        self.max_hash_seconds = max(self.max_hash_seconds, finished - started)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(bcrypt_context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(bcrypt_context.verify, password, hashed_password)
+
+    def stats(self) -> dict:
+        return {'workers': self.workers,
+                'queue_depth': max(0, self.in_flight - self.workers),
+                'in_flight': self.in_flight,
+                'calls': self.calls,
+                'rejected': self.rejected,
+                'wait_seconds': self.wait_seconds,
+                'hash_seconds': self.hash_seconds,
+                'max_hash_seconds': self.max_hash_seconds}
+
+
+password_hasher = PasswordHasher(BCRYPT_WORKERS, BCRYPT_QUEUE_LIMIT)
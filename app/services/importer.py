@@ -0,0 +1,74 @@
+import codecs
+import csv
+import json
+from typing import AsyncIterator
+
+from fastapi import HTTPException, status
+
+#  поддерживаемые форматы загрузки товаров
+CSV_TYPES = ('text/csv',)
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+
+async def read_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    '''корутина-генератор разбивает поток байтов <chunks> на строки, не держа в памяти весь файл'''
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    tail = ''
+    async for chunk in chunks:
+        tail += decoder.decode(chunk)
+        *lines, tail = tail.split('\n')
+        for line in lines:
+            yield line
+    tail += decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+async def read_csv(lines: AsyncIterator[str]) -> AsyncIterator[tuple[int, dict | None]]:
+    '''разбирает CSV с заголовком; значение в кавычках может занимать несколько строк'''
+    header = None
+    row_number = 0
+    record = ''
+    async for line in lines:
+        record += line if not record else '\n' + line
+        if record.count('"') % 2:  # кавычка не закрыта - запись продолжается на следующей строке
+            continue
+        values = next(csv.reader([record]), [])
+        record = ''
+        if not values:
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        row_number += 1
+        yield row_number, dict(zip(header, values)) if len(values) == len(header) else None
+    if record:
+        yield row_number + 1, None
+
+
+async def read_ndjson(lines: AsyncIterator[str]) -> AsyncIterator[tuple[int, dict | None]]:
+    '''разбирает NDJSON: по одному JSON-объекту в строке'''
+    row_number = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield row_number, row if isinstance(row, dict) else None
+
+
+def read_rows(chunks: AsyncIterator[bytes], content_type: str) -> AsyncIterator[tuple[int, dict | None]]:
+    '''возвращает генератор пар (номер строки, поля товара); None вместо полей - строку не удалось разобрать'''
+    media_type = content_type.split(';')[0].strip().lower()
+    if media_type in CSV_TYPES:
+        return read_csv(read_lines(chunks))
+    if media_type in NDJSON_TYPES:
+        return read_ndjson(read_lines(chunks))
+
+    raise HTTPException(
+        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        detail="Upload products as text/csv or application/x-ndjson"
+    )
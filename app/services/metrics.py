@@ -0,0 +1,119 @@
+from bisect import bisect_left
+from contextvars import ContextVar
+from time import perf_counter
+
+from fastapi import Request
+from sqlalchemy import event
+
+#  границы корзин гистограмм: длительность запросов и число SQL-запросов на HTTP-запрос
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    '''гистограмма в формате Prometheus с набором меток; значения хранятся по корзинам, без самих наблюдений'''
+
+    def __init__(self, name: str, description: str, labels: tuple, buckets: tuple):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}  # значения меток -> [счётчики по корзинам..., сумма, количество]
+
+    def observe(self, label_values: tuple, value: float):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        for label_values, series in self._series.items():
+            labels = ','.join(f'{name}="{value}"' for name, value in zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {series[-1]}')
+            lines.append(f'{self.name}_sum{{{labels}}} {series[-2]}')
+            lines.append(f'{self.name}_count{{{labels}}} {series[-1]}')
+        return lines
+
+
+request_latency = Histogram('http_request_duration_seconds', 'HTTP request latency',
+                            ('method', 'route', 'status'), LATENCY_BUCKETS)
+request_queries = Histogram('db_queries_per_request', 'SQL statements executed per HTTP request',
+                            ('method', 'route'), QUERY_COUNT_BUCKETS)
+request_db_time = Histogram('db_time_per_request_seconds', 'Time spent in SQL statements per HTTP request',
+                            ('method', 'route'), LATENCY_BUCKETS)
+
+#  счётчики SQL текущего HTTP-запроса: [число запросов, суммарное время]
+_request_db_stats: ContextVar[list | None] = ContextVar('request_db_stats', default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _request_db_stats.get()
+    if stats is not None:
+        stats[0] += 1
+        stats[1] += perf_counter() - context._metrics_started
+
+
+def instrument_engine(engine):
+    '''подписывается на события движка <engine>, чтобы считать SQL-запросы и время БД по HTTP-запросам'''
+    event.listen(engine.sync_engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine.sync_engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+async def metrics_middleware(request: Request, call_next):
+    stats = [0, 0.0]
+    token = _request_db_stats.set(stats)
+    started = perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        elapsed = perf_counter() - started
+        _request_db_stats.reset(token)
+        #  шаблон маршрута (/products/{category_slug}), а не сам путь - иначе меток будет столько же, сколько URL
+        route = getattr(request.scope.get('route'), 'path', 'unmatched')
+        request_latency.observe((request.method, route, status_code), elapsed)
+        request_queries.observe((request.method, route), stats[0])
+        request_db_time.observe((request.method, route), stats[1])
+
+
+def render_gauges(name: str, description: str, *series: tuple[dict, dict]) -> list[str]:
+    '''текущие значения в виде метрик <name>_<ключ>; <series> - пары (метки, значения), например
+    ({'engine': 'primary'}, pool_status(...)) или ({}, cache.stats())'''
+    keys = []
+    for _, values in series:
+        keys += [key for key, value in values.items()
+                 if key not in keys and isinstance(value, (int, float)) and not isinstance(value, bool)]
+
+    lines = []
+    for key in keys:
+        lines.append(f'# HELP {name}_{key} {description}: {key}')
+        lines.append(f'# TYPE {name}_{key} gauge')
+        for labels, values in series:
+            if key in values:
+                label_text = ','.join(f'{label}="{value}"' for label, value in labels.items())
+                lines.append(f'{name}_{key}{{{label_text}}} {values[key]}' if label_text
+                             else f'{name}_{key} {values[key]}')
+    return lines
+
+
+def render(*extra: list[str]) -> str:
+    '''все метрики в текстовом формате Prometheus'''
+    lines = request_latency.render() + request_queries.render() + request_db_time.render()
+    for block in extra:
+        lines.extend(block)
+    return '\n'.join(lines) + '\n'
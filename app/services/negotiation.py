@@ -0,0 +1,152 @@
+'''Согласование содержимого: сжатие ответов (gzip, brotli) и форматы больших списков
+(JSON, MessagePack, NDJSON) по заголовкам Accept-Encoding и Accept.
+
+brotli и msgpack - необязательные зависимости: без них сервер отвечает gzip и JSON/NDJSON.
+'''
+from functools import cache
+
+import anyio.to_thread
+from fastapi import Request, Response
+from pydantic import BaseModel, TypeAdapter
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import DEFAULT_EXCLUDED_CONTENT_TYPES, GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+NDJSON = 'application/x-ndjson'
+
+#  значения Accept -> формат ответа; при равном весе выбирается тип, названный клиентом первым
+FORMATS = {'*/*': JSON, 'application/*': JSON, JSON: JSON, NDJSON: NDJSON, 'application/jsonl': NDJSON}
+if msgpack is not None:
+    FORMATS.update(dict.fromkeys((MSGPACK, 'application/x-msgpack', 'application/vnd.msgpack'), MSGPACK))
+
+
+def quality_values(header: str) -> dict[str, float]:
+    '''разбирает заголовок вида Accept / Accept-Encoding <header> в словарь значение -> вес q'''
+    values = {}
+    for part in header.split(','):
+        value, *params = part.split(';')
+        value = value.strip().lower()
+        if not value:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, number = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        values[value] = quality
+    return values
+
+
+class BrotliResponder(IdentityResponder):
+    '''сжатие тела ответа brotli; порог размера, потоковые ответы и исключённые типы - как у GZipResponder'''
+    content_encoding = 'br'
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int, thread_minimum_size: int,
+                 exclude_content_types: tuple = DEFAULT_EXCLUDED_CONTENT_TYPES):
+        super().__init__(app, minimum_size, exclude_content_types=exclude_content_types)
+        self.quality = quality
+        self.thread_minimum_size = thread_minimum_size
+        self._compressor = None
+
+    def _compress_body(self, body: bytes, more_body: bool) -> bytes:
+        if self._compressor is None:
+            self._compressor = brotli.Compressor(quality=self.quality)
+        if more_body:
+            return self._compressor.process(body) + self._compressor.flush()
+        return self._compressor.process(body) + self._compressor.finish()
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        #  большие куски сжимаются в потоке, чтобы не останавливать цикл событий
+        if len(body) >= self.thread_minimum_size:
+            return await anyio.to_thread.run_sync(self._compress_body, body, more_body)
+        return self._compress_body(body, more_body)
+
+
+class CompressionMiddleware:
+    '''сжимает ответы не меньше <minimum_size> байт кодировкой, которую клиент предпочитает
+    в Accept-Encoding: brotli (если установлен) или gzip; при равных весах - brotli'''
+
+    def __init__(self, app: ASGIApp, minimum_size: int, gzip_level: int, brotli_quality: int,
+                 thread_minimum_size: int = 128 * 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.thread_minimum_size = thread_minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        encodings = quality_values(Headers(scope=scope).get('accept-encoding', ''))
+        br, gzip = encodings.get('br', 0), encodings.get('gzip', 0)
+        if brotli is not None and br > 0 and br >= gzip:
+            responder = BrotliResponder(self.app, self.minimum_size, self.brotli_quality, self.thread_minimum_size)
+        elif gzip > 0:
+            responder = GZipResponder(self.app, self.minimum_size, self.gzip_level,
+                                      thread_minimum_size=self.thread_minimum_size)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size)
+        await responder(scope, receive, send)
+
+
+def negotiate(accept: str) -> str:
+    '''формат ответа для заголовка Accept <accept>; JSON, если клиент не назвал другой известный формат'''
+    media_type, best = JSON, 0.0
+    for value, quality in quality_values(accept).items():
+        if value in FORMATS and quality > best:
+            media_type, best = FORMATS[value], quality
+    return media_type
+
+
+@cache
+def list_adapter(item_model: type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(list[item_model])
+
+
+@cache
+def item_adapter(item_model: type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(item_model)
+
+
+def represent(request: Request, response: Response, content: dict | list, item_model: type[BaseModel]):
+    '''представляет список в формате, который клиент запросил в Accept
+
+    <content> - страница {'items': ..., 'next': ...} или просто список записей схемы <item_model>.
+    Для JSON <content> возвращается как есть и сериализуется по response_model эндпоинта;
+    MessagePack и NDJSON возвращаются готовым ответом с заголовками <response> (ETag и т.п.).
+    В NDJSON каждая запись - отдельная строка, а курсор следующей страницы - в заголовке Link.
+    '''
+    response.headers.add_vary_header('Accept')
+    media_type = negotiate(request.headers.get('accept', ''))
+    if media_type == JSON:
+        return content
+
+    page = isinstance(content, dict)
+    items = list_adapter(item_model).validate_python(content['items'] if page else content)
+    headers = dict(response.headers)
+    if media_type == NDJSON:
+        adapter = item_adapter(item_model)
+        body = b''.join(adapter.dump_json(item) + b'\n' for item in items)
+        if page and content['next']:
+            headers['Link'] = f'<{request.url.include_query_params(after=content["next"])}>; rel="next"'
+    else:
+        items = list_adapter(item_model).dump_python(items, mode='json')
+        body = msgpack.packb({'items': items, 'next': content['next']} if page else items)
+    return Response(content=body, media_type=media_type, headers=headers)
@@ -0,0 +1,77 @@
+import json
+from datetime import datetime
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from fastapi import HTTPException, status
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def key_ordering(keys: tuple, descending: bool) -> str:
+    '''имя порядка сортировки по ключу <keys>, например "-price,-id"; записывается в курсор,
+    чтобы курсор одной сортировки нельзя было предъявить другой'''
+    sign = '-' if descending else ''
+    return ','.join(sign + (getattr(key, 'key', None) or key.name) for key in keys)
+
+
+def encode_cursor(ordering: str, *values) -> str:
+    '''упаковывает порядок <ordering> и значения ключа последней записи страницы в непрозрачный токен <after>
+    (дата и время записываются в формате ISO)'''
+    raw = json.dumps((ordering, *values), separators=(',', ':'), default=datetime.isoformat).encode()
+    return urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def cursor_value(key, value):
+    '''значение <value> из курсора, приведённое к типу столбца ключа <key>; ValueError, если типы не совпадают'''
+    python_type = key.type.python_type
+    if python_type is datetime and isinstance(value, str):
+        return datetime.fromisoformat(value)
+    if python_type is float and isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, python_type) and not isinstance(value, bool):
+        return value
+    raise ValueError(f'{value!r} is not a valid {key.type} value')
+
+
+def decode_cursor(token: str, keys: tuple, ordering: str) -> list:
+    '''распаковывает токен <after> обратно в список значений столбцов ключа <keys>;
+    курсор другого порядка сортировки или со значениями не того типа - ошибка 400'''
+    try:
+        values = json.loads(urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        if isinstance(values, list) and len(values) == len(keys) + 1 and values[0] == ordering:
+            return [cursor_value(key, value) for key, value in zip(keys, values[1:])]
+    except (ValueError, TypeError):
+        pass
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Invalid pagination cursor"
+    )
+
+
+async def paginate(db: AsyncSession, query: Select, keys: tuple, after: str | None, limit: int,
+                   descending: bool = False) -> dict:
+    '''корутина возвращает одну страницу выборки <query>, упорядоченной по ключу <keys>
+
+    <keys> - столбцы сортировки, последний из которых уникален (обычно id); все сортируются
+    в одном направлении, поэтому продолжение страницы - это одно сравнение кортежей (row value),
+    которое Postgres выполняет по индексу. Стоимость запроса зависит только от <limit>,
+    а не от номера страницы. Запрашивается на одну строку больше, чтобы понять, есть ли продолжение.
+    Записи страницы - словари из столбцов <query> (столбцы ключа добавляются к выборке отдельно).
+
+    Записи, у которых столбец ключа равен NULL, в выборку не попадают: сравнение кортежа с NULL
+    не бывает истинным, и такие записи терялись бы на границах страниц.
+    '''
+    ordering = key_ordering(keys, descending)
+    query = query.where(*(key.isnot(None) for key in keys if getattr(key, 'nullable', False)))
+    if after is not None:
+        last_key = tuple_(*keys)
+        values = tuple(decode_cursor(after, keys, ordering))
+        query = query.where(last_key < values if descending else last_key > values)
+
+    order = [key.desc() for key in keys] if descending else keys
+    names = query.selected_columns.keys()
+    rows = (await db.execute(query.add_columns(*keys).order_by(*order).limit(limit + 1))).all()
+    items = [dict(zip(names, row)) for row in rows[:limit]]
+    next_cursor = encode_cursor(ordering, *rows[limit - 1][-len(keys):]) if len(rows) > limit else None
+
+    return {'items': items, 'next': next_cursor}
@@ -0,0 +1,62 @@
+'''Гистограммы оценок товаров: сколько активных оценок каждого значения у товара.
+
+Гистограммы поддерживаются при записи и удалении отзывов. Полный пересчёт по таблице оценок
+(после ручных правок данных или восстановления из бэкапа):
+
+    python -m app.services.rating_histogram
+'''
+import asyncio
+
+from sqlalchemy import Insert, Select, delete, func, literal, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.backend.db import async_session_maker
+from app.models import Rating, RatingHistogram
+
+#  возможные значения оценки (см. CreateReview.rating_grade)
+GRADES = range(0, 6)
+
+
+def histogram_upsert(product_id: int, changes: Select) -> Insert:
+    '''INSERT ... ON CONFLICT, который сдвигает счётчики гистограммы товара <product_id>;
+    <changes> - выборка пар (оценка, изменение), одна оценка может встречаться в ней несколько раз'''
+    changes = changes.subquery()
+    grade, delta = changes.c
+    upsert = insert(RatingHistogram).from_select(
+        ['product_id', 'grade', 'count'],
+        select(literal(product_id), grade, func.sum(delta)).group_by(grade))
+    return upsert.on_conflict_do_update(index_elements=[RatingHistogram.product_id, RatingHistogram.grade],
+                                        set_={'count': RatingHistogram.count + upsert.excluded.count})
+
+
+async def load_histogram(db: AsyncSession, product_id: int) -> dict[int, int]:
+    '''корутина возвращает гистограмму оценок товара <product_id> с нулями для отсутствующих оценок'''
+    counts = dict((await db.execute(select(RatingHistogram.grade, RatingHistogram.count)
+                                    .where(RatingHistogram.product_id == product_id))).all())
+    return {grade: counts.get(grade, 0) for grade in GRADES}
+
+
+async def rebuild_histograms(db: AsyncSession):
+    '''корутина пересчитывает гистограммы всех товаров одним проходом по активным оценкам
+
+    На время пересчёта таблица гистограмм блокируется от записи: отзывы, пришедшие во время
+    пересчёта, дождутся его окончания и применят свои изменения к уже пересчитанным счётчикам.
+    '''
+    await db.execute(text('LOCK TABLE rating_histograms IN EXCLUSIVE MODE'))
+    await db.execute(delete(RatingHistogram))
+    await db.execute(insert(RatingHistogram).from_select(
+        ['product_id', 'grade', 'count'],
+        select(Rating.product_id, Rating.grade, func.count())
+        .where(Rating.is_active == True)
+        .group_by(Rating.product_id, Rating.grade)))
+    await db.commit()
+
+
+async def main():
+    async with async_session_maker() as db:
+        await rebuild_histograms(db)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,34 @@
+'''Очистка таблицы refresh-токенов от записей, которые уже не могут пригодиться.
+
+Удаляются просроченные токены и токены, отозванные при выходе или после обнаруженной кражи.
+Обменянные (ROTATED) токены хранятся до истечения срока: по ним распознаётся повторное
+предъявление украденного токена. Запускать периодически (cron, systemd timer):
+
+    python -m app.services.refresh_tokens
+'''
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import delete, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.backend.db import async_session_maker
+from app.models.tokens import RefreshToken, ROTATED
+
+
+async def purge_refresh_tokens(db: AsyncSession) -> int:
+    '''корутина удаляет ненужные refresh-токены и возвращает их количество'''
+    result = await db.execute(delete(RefreshToken).where(or_(
+        RefreshToken.expires_at < datetime.now(),
+        (RefreshToken.is_active == False) & (RefreshToken.revoked_reason.is_distinct_from(ROTATED)))))
+    await db.commit()
+    return result.rowcount
+
+
+async def main():
+    async with async_session_maker() as db:
+        print(f'{await purge_refresh_tokens(db)} refresh tokens deleted')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
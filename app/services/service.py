@@ -1,26 +1,21 @@
 from fastapi import HTTPException, status
-from sqlalchemy import select, update
+from sqlalchemy import Numeric, Update, case, cast, func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models import Product, Rating
+from app.models import Product
 
 
-async def update_rating(db: AsyncSession,
-                        product_id: int):
-    '''корутина пересчитывает рейтинг товара в базе данных <db> по его id <product_id>'''
-
-    ratings = await db.scalars(select(Rating).where(Rating.product_id == product_id,
-                                                    Rating.is_active == True))
-    rating_list = [rating.grade for rating in ratings.all()]
-    if rating_list:
-        await db.execute(
-            update(Product).where(Product.id == product_id).values(rating=round(sum(rating_list) / len(rating_list), 1))
-        )
-    else:
-        await db.execute(
-            update(Product).where(Product.id == product_id).values(rating=0.0)
-        )
-    await db.commit()
+def rating_update(product_id: int, grade_delta, count_delta) -> Update:
+    '''UPDATE, который сдвигает накопленные сумму и количество оценок товара <product_id> на <grade_delta>
+    и <count_delta> (числа или SQL-выражения) и пересчитывает из них средний рейтинг'''
+    rating_sum = Product.rating_sum + grade_delta
+    rating_count = Product.rating_count + count_delta
+    return update(Product).where(Product.id == product_id).values(
+        rating_sum=rating_sum,
+        rating_count=rating_count,
+        rating=case((rating_count > 0, func.round(cast(rating_sum, Numeric) / rating_count, 1)),
+                    else_=0.0)
+    )
 
 
 async def get_object_or_404(db: AsyncSession, model, expression: tuple):
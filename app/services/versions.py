@@ -0,0 +1,56 @@
+from datetime import datetime
+from typing import NamedTuple
+
+from sqlalchemy import Insert, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import ResourceVersion
+
+
+class VersionStamp(NamedTuple):
+    '''версия ресурса и момент её изменения (None, если ресурс ещё не менялся)'''
+    version: int
+    updated_at: datetime | None
+
+
+def product_resource(product_slug: str) -> str:
+    '''имя ресурса "товар <product_slug>": карточка, рейтинг и отзывы товара'''
+    return f'product:{product_slug}'
+
+
+def version_bump(*names: str) -> Insert:
+    '''INSERT ... ON CONFLICT, который увеличивает версии ресурсов <names>; его можно выполнить
+    отдельно или добавить CTE к другому запросу записи, не тратя лишнего обращения к БД'''
+    now = datetime.now()
+    #  повторное имя в одном INSERT ... ON CONFLICT - ошибка Postgres, поэтому дубликаты убираются
+    return (insert(ResourceVersion).values([{'name': name, 'version': 1, 'updated_at': now}
+                                            for name in dict.fromkeys(names)])
+            .on_conflict_do_update(index_elements=[ResourceVersion.name],
+                                   set_={'version': ResourceVersion.version + 1,
+                                         'updated_at': now})
+            .returning(ResourceVersion.version, ResourceVersion.updated_at))
+
+
+async def bump_version(db: AsyncSession, name: str) -> VersionStamp:
+    '''корутина увеличивает версию ресурса <name> в текущей транзакции <db> и возвращает новую версию'''
+    return VersionStamp(*(await db.execute(version_bump(name))).one())
+
+
+async def bump_after_commit(db: AsyncSession, *names: str):
+    '''корутина увеличивает версии общих ресурсов <names> (например, списка 'products') отдельной
+    короткой транзакцией после коммита записи в <db>
+
+    Строку общей версии меняют все записи, и внутри транзакции записи её блокировка выстроила бы
+    в очередь запросы к разным товарам. Читатель, успевший между двумя коммитами увидеть новые
+    данные со старой версией, лишь один раз повторно получит ту же страницу.
+    '''
+    await db.execute(version_bump(*names))
+    await db.commit()
+
+
+async def get_version(db: AsyncSession, name: str) -> VersionStamp:
+    '''корутина возвращает текущую версию ресурса <name> (0, если ресурс ещё не менялся)'''
+    stamp = (await db.execute(select(ResourceVersion.version, ResourceVersion.updated_at)
+                              .where(ResourceVersion.name == name))).first()
+    return VersionStamp(*stamp) if stamp else VersionStamp(0, None)
@@ -0,0 +1,44 @@
+'''Сравнение пропускной способности get_current_user с кэшем проверенных токенов и без него.
+
+Запуск из корня проекта (нужны SECRET_KEY и ALGORITHM в окружении или .env):
+
+    python -m benchmarks.auth_cache --tokens 100 --requests 100000
+'''
+import argparse
+import asyncio
+from datetime import timedelta
+from time import perf_counter
+
+from app.routers.auth import create_access_token, get_current_user
+from app.services.cache import token_cache
+
+
+async def run(tokens: list[str], requests: int, cached: bool) -> float:
+    '''возвращает число проверок токена в секунду'''
+    token_cache.clear()
+    started = perf_counter()
+    for i in range(requests):
+        if not cached:
+            token_cache.clear()
+        await get_current_user(tokens[i % len(tokens)])
+    return requests / (perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tokens', type=int, default=100, help='число разных токенов (клиентов)')
+    parser.add_argument('--requests', type=int, default=100000, help='число проверок токена')
+    args = parser.parse_args()
+
+    tokens = [create_access_token(f'user{i}', i, False, False, True, expires_delta=timedelta(minutes=20))
+              for i in range(args.tokens)]
+
+    uncached = asyncio.run(run(tokens, args.requests, cached=False))
+    cached = asyncio.run(run(tokens, args.requests, cached=True))
+    print(f'uncached: {uncached:12.0f} req/s')
+    print(f'cached:   {cached:12.0f} req/s')
+    print(f'speedup:  {cached / uncached:12.1f}x')
+
+
+if __name__ == '__main__':
+    main()
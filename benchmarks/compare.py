@@ -0,0 +1,59 @@
+'''Сравнение двух прогонов benchmarks.load: задержки и пропускная способность по каждой операции.
+
+    python -m benchmarks.compare before.json after.json --threshold 10
+
+Код возврата 1, если p95 какой-либо операции вырос больше чем на --threshold процентов
+или появились ошибки 5xx, которых не было в базовом прогоне.
+'''
+import argparse
+import json
+import sys
+
+
+def change(before: float | None, after: float | None) -> float | None:
+    if not before or after is None:
+        return None
+    return (after - before) / before * 100
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=10, help='допустимый рост p95 в процентах')
+    parser.add_argument('--min-count', type=int, default=20, help='операции с меньшим числом запросов не проверяются')
+    args = parser.parse_args()
+
+    with open(args.before) as file:
+        before = json.load(file)
+    with open(args.after) as file:
+        after = json.load(file)
+
+    print(f"before: {before.get('commit')}  after: {after.get('commit')}")
+    print(f"{'operation':<22}{'p50 ms':>18}{'p95 ms':>18}{'p99 ms':>18}{'rps':>18}{'Δp95 %':>9}")
+    regressions = []
+    operations = {**before['operations'], 'TOTAL': before['total']}
+    for name, old in operations.items():
+        new = after['total'] if name == 'TOTAL' else after['operations'].get(name)
+        if new is None:
+            continue
+        cells = ''.join(f"{str(old.get(key, '-')) + ' → ' + str(new.get(key, '-')):>18}"
+                        for key in ('p50_ms', 'p95_ms', 'p99_ms', 'rps'))
+        delta = change(old.get('p95_ms'), new.get('p95_ms'))
+        print(f"{name:<22}{cells}{'' if delta is None else f'{delta:+.1f}':>9}")
+
+        if min(old['count'], new['count']) < args.min_count:
+            continue
+        if delta is not None and delta > args.threshold:
+            regressions.append(f'{name}: p95 {old["p95_ms"]} → {new["p95_ms"]} ms ({delta:+.1f}%)')
+        if new.get('errors', 0) and not old.get('errors', 0):
+            regressions.append(f'{name}: {new["errors"]} server errors')
+
+    if regressions:
+        print('\nRegressions:')
+        print('\n'.join(regressions))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
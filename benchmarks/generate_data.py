@@ -0,0 +1,280 @@
+'''Генератор больших синтетических наборов данных: дерево категорий, пользователи, товары, оценки и отзывы.
+
+Данные полностью определяются --seed: одинаковые параметры дают одинаковый набор. Строки загружаются
+через COPY (asyncpg) пачками по --batch, идентификаторы назначаются заранее, поэтому связи между
+таблицами не требуют обращений к БД. Популярность товаров подчиняется закону Ципфа (--zipf), так что
+немногие товары собирают большую часть отзывов; пары (пользователь, товар) не повторяются, как того
+требуют uc_rating_user_product и uc_review_user_product.
+
+    python -m benchmarks.generate_data --seed 1 --products 1000000 --categories 2000 --depth 6 \\
+        --users 100000 --reviews 5000000 --out dataset.json
+'''
+import argparse
+import asyncio
+import bisect
+import itertools
+import json
+import random
+from datetime import datetime, timedelta
+from time import perf_counter
+
+from sqlalchemy import Numeric, cast, func, insert, select, text, update
+
+from app.backend.db import async_session_maker
+from app.models import Category, Product, Rating, RatingHistogram, Review, User
+from app.services.hashing import bcrypt_context
+from app.services.versions import version_bump
+
+ADJECTIVES = ('red', 'green', 'blue', 'black', 'steel', 'wooden', 'smart', 'compact', 'classic', 'sport',
+              'kids', 'pro', 'mini', 'ultra', 'vintage', 'wireless', 'organic', 'premium', 'travel', 'home')
+NOUNS = ('phone', 'chair', 'lamp', 'kettle', 'jacket', 'table', 'watch', 'camera', 'bag', 'shoes',
+         'laptop', 'sofa', 'mug', 'bottle', 'headphones', 'backpack', 'blender', 'desk', 'mirror', 'tent')
+COMMENT_WORDS = ('great', 'good', 'bad', 'quality', 'price', 'delivery', 'fast', 'slow', 'broke', 'love',
+                 'recommend', 'cheap', 'expensive', 'size', 'color', 'works', 'perfect', 'again', 'never', 'ok')
+#  оценки смещены к высоким, как в реальных магазинах
+GRADES = (1, 2, 3, 4, 5)
+GRADE_WEIGHTS = (5, 5, 10, 30, 50)
+#  отзывы распределяются по двум годам до фиксированной даты, чтобы набор не зависел от момента запуска
+REVIEWS_END = datetime(2026, 1, 1)
+REVIEWS_SPAN_SECONDS = 2 * 365 * 24 * 3600
+
+USER_COLUMNS = (User.id, User.first_name, User.last_name, User.username, User.email, User.hashed_password,
+                User.is_active, User.is_admin, User.is_supplier, User.is_customer)
+CATEGORY_COLUMNS = (Category.id, Category.name, Category.slug, Category.is_active, Category.parent_id)
+#  search_vector не загружается: это вычисляемая колонка, её заполняет сам Postgres
+PRODUCT_COLUMNS = (Product.id, Product.name, Product.slug, Product.description, Product.price, Product.image_url,
+                   Product.stock, Product.rating, Product.rating_sum, Product.rating_count, Product.is_active,
+                   Product.category_id, Product.supplier_id)
+RATING_COLUMNS = (Rating.id, Rating.grade, Rating.user_id, Rating.product_id, Rating.is_active)
+REVIEW_COLUMNS = (Review.id, Review.comment, Review.is_active, Review.comment_date, Review.user_id,
+                  Review.product_id, Review.rating_id)
+
+SAMPLE_SIZE = 10000  # сколько товаров и отзывов попадает в описание набора для нагрузочных сценариев
+
+
+def batched(rows, size: int):
+    iterator = iter(rows)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+async def copy_rows(db, columns: tuple, rows, batch_size: int) -> int:
+    '''корутина загружает строки <rows> в таблицу колонок <columns> через COPY пачками по <batch_size>'''
+    connection = await (await db.connection()).get_raw_connection()
+    table = columns[0].table.name
+    names = [column.name for column in columns]
+    count = 0
+    for batch in batched(rows, batch_size):
+        await connection.driver_connection.copy_records_to_table(table, records=batch, columns=names)
+        count += len(batch)
+    return count
+
+
+async def next_id(db, model) -> int:
+    return (await db.scalar(select(func.coalesce(func.max(model.id), 0)))) + 1
+
+
+def category_levels(total: int, depth: int) -> list[int]:
+    '''размеры уровней дерева из <total> категорий глубины <depth> с одинаковым ветвлением на каждом уровне'''
+    depth = max(1, min(depth, total))
+    branching = 1.0
+    while sum(round(branching ** level) for level in range(depth)) < total:
+        branching += 0.01
+    sizes = [max(1, round(branching ** level)) for level in range(depth)]
+    sizes[-1] -= sum(sizes) - total
+    return sizes
+
+
+def slug_of(name: str) -> str:
+    #  имена состоят из латиницы, цифр и пробелов, поэтому результат совпадает со slugify(name)
+    return name.lower().replace(' ', '-')
+
+
+async def generate(seed: int = 1, prefix: str = 'gen', products: int = 10000, categories: int = 100, depth: int = 4,
+                   users: int = 1000, suppliers: int = 10, reviews: int = 20000, zipf: float = 1.1,
+                   password: str = 'password', batch: int = 50000, log=print) -> dict:
+    '''корутина генерирует и загружает набор данных, возвращает его описание для нагрузочных сценариев'''
+    rng = random.Random(seed)
+    timings = {}
+
+    async with async_session_maker() as db:
+        first_user, first_category, first_product, first_rating, first_review = [
+            await next_id(db, model) for model in (User, Category, Product, Rating, Review)]
+
+        #  пользователи: администратор, поставщики и покупатели; хеш bcrypt один на всех - иначе
+        #  генерация миллиона пользователей заняла бы часы
+        started = perf_counter()
+        hashed_password = bcrypt_context.hash(password)
+        admin_id = first_user
+        supplier_ids = list(range(first_user + 1, first_user + 1 + suppliers))
+        customer_ids = list(range(first_user + 1 + suppliers, first_user + 1 + suppliers + users))
+
+        def user_rows():
+            yield (admin_id, 'admin', prefix, f'{prefix}admin', f'{prefix}admin@example.com', hashed_password,
+                   True, True, False, False)
+            for number, user_id in enumerate(supplier_ids):
+                yield (user_id, 'supplier', prefix, f'{prefix}supplier{number}', f'{prefix}supplier{number}@example.com',
+                       hashed_password, True, False, True, False)
+            for number, user_id in enumerate(customer_ids):
+                yield (user_id, 'customer', prefix, f'{prefix}user{number}', f'{prefix}user{number}@example.com',
+                       hashed_password, True, False, False, True)
+
+        await copy_rows(db, USER_COLUMNS, user_rows(), batch)
+        timings['users'] = perf_counter() - started
+
+        #  дерево категорий: уровни растут с постоянным ветвлением, родитель выбирается на предыдущем уровне
+        started = perf_counter()
+        category_rows = []
+        parents = {}
+        previous_level = []
+        category_id = first_category
+        for level, size in enumerate(category_levels(categories, depth)):
+            current_level = []
+            for _ in range(size):
+                parent_id = rng.choice(previous_level) if previous_level else None
+                name = f'{prefix} category {category_id}'
+                category_rows.append((category_id, name, slug_of(name), True, parent_id))
+                parents[category_id] = parent_id
+                current_level.append(category_id)
+                category_id += 1
+            previous_level = current_level
+        await copy_rows(db, CATEGORY_COLUMNS, category_rows, batch)
+        #  товары лежат в листовых категориях
+        leaves = sorted(set(parents) - set(parents.values()))
+        timings['categories'] = perf_counter() - started
+
+        #  товары
+        started = perf_counter()
+        product_ids = range(first_product, first_product + products)
+        product_suppliers = {}
+
+        def product_rows():
+            for product_id in product_ids:
+                name = f'{prefix} {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {product_id}'
+                supplier_id = rng.choice(supplier_ids) if supplier_ids else None
+                if len(product_suppliers) < SAMPLE_SIZE:
+                    product_suppliers[product_id] = (name, supplier_id)
+                yield (product_id, name, slug_of(name), ' '.join(rng.choices(ADJECTIVES + NOUNS, k=10)),
+                       int(rng.lognormvariate(8, 1.2)) + 1, f'https://example.com/images/{product_id}.png',
+                       0 if rng.random() < 0.1 else rng.randint(1, 500), 0.0, 0, 0, True,
+                       rng.choice(leaves), supplier_id)
+
+        await copy_rows(db, PRODUCT_COLUMNS, product_rows(), batch)
+        timings['products'] = perf_counter() - started
+
+        #  оценки и отзывы: товар выбирается по закону Ципфа, пользователь - равномерно,
+        #  повторная пара (пользователь, товар) перевыбирается
+        started = perf_counter()
+        reviews = min(reviews, users * products)
+        cumulative = list(itertools.accumulate(1 / rank ** zipf for rank in range(1, products + 1)))
+        popularity = list(product_ids)
+        rng.shuffle(popularity)  # самые популярные товары разбросаны по каталогу, а не идут первыми
+        pairs = set()
+        review_plan = []  # (пользователь, товар, оценка)
+        while len(review_plan) < reviews:
+            user_id = rng.choice(customer_ids)
+            product_id = popularity[bisect.bisect_left(cumulative, rng.random() * cumulative[-1])]
+            if (user_id, product_id) in pairs:
+                continue
+            pairs.add((user_id, product_id))
+            review_plan.append((user_id, product_id, rng.choices(GRADES, GRADE_WEIGHTS)[0]))
+        del pairs
+
+        await copy_rows(db, RATING_COLUMNS,
+                        ((first_rating + number, grade, user_id, product_id, True)
+                         for number, (user_id, product_id, grade) in enumerate(review_plan)), batch)
+        await copy_rows(db, REVIEW_COLUMNS,
+                        ((first_review + number, ' '.join(rng.choices(COMMENT_WORDS, k=rng.randint(3, 30))), True,
+                          REVIEWS_END - timedelta(seconds=rng.randrange(REVIEWS_SPAN_SECONDS)),
+                          user_id, product_id, first_rating + number)
+                         for number, (user_id, product_id, _) in enumerate(review_plan)), batch)
+        timings['reviews'] = perf_counter() - started
+
+        #  агрегаты рейтинга и гистограммы оценок считаются в БД по загруженным оценкам
+        started = perf_counter()
+        totals = (select(Rating.product_id,
+                         func.sum(Rating.grade).label('grade_sum'),
+                         func.count().label('grades'))
+                  .where(Rating.id >= first_rating)
+                  .group_by(Rating.product_id).subquery())
+        await db.execute(update(Product)
+                         .where(Product.id == totals.c.product_id)
+                         .values(rating_sum=totals.c.grade_sum,
+                                 rating_count=totals.c.grades,
+                                 rating=func.round(cast(totals.c.grade_sum, Numeric) / totals.c.grades, 1)))
+
+        await db.execute(insert(RatingHistogram).from_select(
+            ['product_id', 'grade', 'count'],
+            select(Rating.product_id, Rating.grade, func.count())
+            .where(Rating.id >= first_rating)
+            .group_by(Rating.product_id, Rating.grade)))
+
+        #  последовательности должны продолжать нумерацию после загруженных идентификаторов
+        for model in (User, Category, Product, Rating, Review):
+            await db.execute(text(f"SELECT setval(pg_get_serial_sequence('{model.__tablename__}', 'id'), "
+                                  f"(SELECT max(id) FROM {model.__tablename__}))"))
+        #  новые категории и товары должны сбросить кэши и ETag списков
+        await db.execute(version_bump('categories', 'products'))
+        await db.commit()
+        timings['aggregates'] = perf_counter() - started
+
+    started = perf_counter()
+    async with async_session_maker() as db:
+        #  свежая статистика, чтобы планировщик сразу видел новый объём таблиц
+        for model in (User, Category, Product, Rating, Review):
+            await db.execute(text(f'ANALYZE {model.__tablename__}'))
+        await db.commit()
+    timings['analyze'] = perf_counter() - started
+
+    for stage, seconds in timings.items():
+        log(f'{stage:<12}{seconds:8.1f} s')
+
+    sampled_reviews = review_plan[:SAMPLE_SIZE]
+    return {'prefix': prefix,
+            'password': password,
+            'admin': f'{prefix}admin',
+            'admin_id': admin_id,
+            'suppliers': [f'{prefix}supplier{number}' for number in range(suppliers)],
+            'supplier_ids': supplier_ids,
+            'users': [f'{prefix}user{number}' for number in range(users)],
+            'user_ids': customer_ids,
+            'category_ids': [row[0] for row in category_rows],
+            'category_parents': [row[4] for row in category_rows],
+            'categories': [row[2] for row in category_rows],
+            #  выборка товаров с поставщиком, которому они принадлежат
+            'products': [(name, slug_of(name), supplier_ids.index(supplier_id) if supplier_id else None)
+                         for name, supplier_id in product_suppliers.values()],
+            'reviewed': sorted({slug_of(product_suppliers[product_id][0]) for _, product_id, _ in sampled_reviews
+                                if product_id in product_suppliers}),
+            'reviews': [(slug_of(product_suppliers[product_id][0]), first_review + number)
+                        for number, (_, product_id, _) in enumerate(sampled_reviews)
+                        if product_id in product_suppliers]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--prefix', default='gen', help='префикс имён; наборы с разными префиксами не пересекаются')
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--categories', type=int, default=500)
+    parser.add_argument('--depth', type=int, default=5, help='глубина дерева категорий')
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--suppliers', type=int, default=50)
+    parser.add_argument('--reviews', type=int, default=200000)
+    parser.add_argument('--zipf', type=float, default=1.1, help='показатель степенного распределения популярности')
+    parser.add_argument('--password', default='password', help='пароль всех сгенерированных пользователей')
+    parser.add_argument('--batch', type=int, default=50000, help='строк в одной пачке COPY')
+    parser.add_argument('--out', help='куда записать описание набора (для benchmarks.load --data)')
+    args = parser.parse_args()
+
+    started = perf_counter()
+    dataset = asyncio.run(generate(args.seed, args.prefix, args.products, args.categories, args.depth, args.users,
+                                   args.suppliers, args.reviews, args.zipf, args.password, args.batch))
+    print(f'total       {perf_counter() - started:8.1f} s')
+    if args.out:
+        with open(args.out, 'w') as file:
+            json.dump(dataset, file)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,377 @@
+'''Нагрузочный прогон всех роутеров приложения с отчётом p50/p95/p99 и запросов в секунду.
+
+Приложение использует возможности Postgres (ON CONFLICT, tsvector, частичные индексы), поэтому
+прогон идёт против локального Postgres с применёнными миграциями (alembic upgrade head).
+Настройки подключения берутся из того же окружения / .env, что и у приложения.
+
+    python -m benchmarks.load --seed --products 20000 --concurrency 32 --duration 30 --out bench.json
+
+Данные создаются генератором benchmarks.generate_data (--seed) либо берутся из ранее сохранённого
+описания набора (--data). Без --url приложение запускается через uvicorn в отдельном процессе. Результаты в JSON
+сравниваются между коммитами скриптом benchmarks/compare.py.
+'''
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+from statistics import mean, quantiles
+from time import perf_counter, time
+
+import httpx
+from slugify import slugify
+
+from benchmarks.generate_data import ADJECTIVES, NOUNS, generate
+
+WORDS = ADJECTIVES + NOUNS
+
+
+def prepare(data: dict, logins: int) -> dict:
+    '''дополняет описание набора из benchmarks.generate_data ролями пользователей в сценариях'''
+    spare = max(len(data['user_ids']) // 10, 1)
+    return {**data,
+            'supplier': data['suppliers'][0],
+            #  редактировать можно только товары своего поставщика
+            'products': [(name, slug) for name, slug, supplier in data['products'] if supplier == 0],
+            'users': data['users'][:logins],
+            'perm_user_ids': data['user_ids'][-2 * spare:-spare],
+            'removable_user_ids': data['user_ids'][-spare:]}
+
+
+class Scenario:
+    '''операции над каждым эндпоинтом; каждая возвращает ответ или None, если выполнять её не с чем'''
+
+    def __init__(self, client: httpx.AsyncClient, data: dict, rng: random.Random):
+        self.client = client
+        self.data = data
+        self.rng = rng
+        self.tokens = {}
+        self.refresh_tokens = {}
+        self.counter = 0
+        self.created_products = []
+        self.created_categories = []
+        self.created_users = []
+
+    def unique(self) -> str:
+        self.counter += 1
+        return f"{self.data['prefix']}-run-{os.getpid()}-{self.counter}-{self.rng.random():.9f}"
+
+    async def login(self, username: str):
+        response = await self.client.post('/auth/token', data={'username': username,
+                                                               'password': self.data['password']})
+        response.raise_for_status()
+        self.tokens[username] = response.json()['access_token']
+        self.refresh_tokens[username] = response.json()['refresh_token']
+
+    def auth(self, username: str) -> dict:
+        return {'Authorization': f'Bearer {self.tokens[username]}'}
+
+    def customer(self) -> str:
+        return self.rng.choice(self.data['users'])
+
+    def product(self) -> tuple[str, str]:
+        return self.rng.choice(self.data['products'])
+
+    # --- products
+    async def products_list(self):
+        return await self.client.get('/products/', params={'limit': 50})
+
+    async def products_filtered(self):
+        low = self.rng.randint(100, 50000)
+        return await self.client.get('/products/', params={'min_price': low, 'max_price': low + 20000,
+                                                           'sort': self.rng.choice(('price', '-price', '-rating'))})
+
+    async def products_by_category(self):
+        return await self.client.get(f"/products/{self.rng.choice(self.data['categories'])}")
+
+    async def products_detail(self):
+        return await self.client.get(f'/products/detail/{self.product()[1]}')
+
+    async def products_search(self):
+        return await self.client.get('/products/search', params={'q': ' '.join(self.rng.sample(WORDS, 2))})
+
+    async def products_export(self):
+        return await self.client.get('/products/export')
+
+    async def products_create(self):
+        name = self.unique()
+        response = await self.client.post('/products/', headers=self.auth(self.data['supplier']), json={
+            'name': name, 'description': 'benchmark product', 'price': 1000, 'image_url': 'https://example.com/i.png',
+            'stock': 10, 'category': self.rng.choice(self.data['category_ids'])})
+        self.created_products.append(name)
+        return response
+
+    async def products_update(self):
+        name, slug = self.product()
+        return await self.client.put(f'/products/{slug}', headers=self.auth(self.data['supplier']), json={
+            'name': name, 'description': 'updated by benchmark', 'price': self.rng.randint(100, 100000),
+            'image_url': 'https://example.com/i.png', 'stock': self.rng.randint(1, 50),
+            'category': self.rng.choice(self.data['category_ids'])})
+
+    async def products_delete(self):
+        if not self.created_products:
+            return None
+        slug = slugify(self.created_products.pop())
+        response = await self.client.get(f'/products/detail/{slug}')
+        if response.status_code != 200:
+            return response
+        return await self.client.delete('/products/', headers=self.auth(self.data['supplier']),
+                                        params={'product_id': response.json()['id']})
+
+    async def products_import(self):
+        rows = '\n'.join(json.dumps({'name': self.unique(), 'description': 'imported', 'price': 500,
+                                     'image_url': 'https://example.com/i.png', 'stock': 5,
+                                     'category': self.rng.choice(self.data['category_ids'])}) for _ in range(100))
+        return await self.client.post('/products/import', content=rows.encode(), headers={
+            **self.auth(self.data['supplier']), 'content-type': 'application/x-ndjson'})
+
+    # --- categories
+    async def categories_list(self):
+        return await self.client.get('/categories/')
+
+    async def categories_create(self):
+        name = self.unique()
+        response = await self.client.post('/categories/', headers=self.auth(self.data['admin']), json={
+            'name': name, 'parent_id': self.rng.choice(self.data['category_ids'])})
+        self.created_categories.append(name)
+        return response
+
+    async def categories_update(self):
+        #  имя и родитель не меняются, чтобы не перестраивать дерево, по которому идут остальные запросы
+        index = self.rng.randrange(len(self.data['category_ids']))
+        return await self.client.put('/categories/', headers=self.auth(self.data['admin']),
+                                     params={'category_id': self.data['category_ids'][index]},
+                                     json={'name': f"{self.data['prefix']} category {index}",
+                                           'parent_id': self.data['category_parents'][index]})
+
+    async def categories_delete(self):
+        if not self.created_categories:
+            return None
+        categories = (await self.client.get('/categories/')).json()
+        slug = slugify(self.created_categories.pop())
+        found = [category['id'] for category in categories if category['slug'] == slug]
+        if not found:
+            return None
+        return await self.client.delete('/categories/', headers=self.auth(self.data['admin']),
+                                        params={'category_id': found[0]})
+
+    # --- reviews
+    async def reviews_list(self):
+        return await self.client.get('/reviews/')
+
+    async def reviews_product(self):
+        return await self.client.get(f"/reviews/{self.rng.choice(self.data['reviewed'])}")
+
+    async def reviews_add(self):
+        return await self.client.post(f'/reviews/{self.product()[1]}', headers=self.auth(self.customer()),
+                                      json={'rating_grade': self.rng.randint(1, 5), 'comment': 'benchmark review'})
+
+    async def reviews_delete(self):
+        if not self.data['reviews']:
+            return None
+        slug, review_id = self.data['reviews'].pop()
+        return await self.client.delete(f'/reviews/{slug}', headers=self.auth(self.data['admin']),
+                                        params={'review_id': review_id})
+
+    # --- auth
+    async def auth_token(self):
+        return await self.client.post('/auth/token', data={'username': self.customer(),
+                                                           'password': self.data['password']})
+
+    async def auth_refresh(self):
+        username = self.rng.choice(list(self.refresh_tokens))
+        response = await self.client.post('/auth/refresh', json={'refresh_token': self.refresh_tokens[username]})
+        if response.status_code == 200:
+            self.refresh_tokens[username] = response.json()['refresh_token']
+        return response
+
+    async def auth_me(self):
+        return await self.client.get('/auth/read_current_user', headers=self.auth(self.customer()))
+
+    async def auth_create(self):
+        username = self.unique()
+        response = await self.client.post('/auth/', json={'first_name': 'bench', 'last_name': 'bench',
+                                                          'username': username, 'email': f'{username}@bench.local',
+                                                          'password': self.data['password']})
+        self.created_users.append(username)
+        return response
+
+    # --- permission
+    async def permission_toggle(self):
+        return await self.client.patch('/permission/', headers=self.auth(self.data['admin']),
+                                       params={'user_id': self.rng.choice(self.data['perm_user_ids'])})
+
+    async def permission_delete(self):
+        if not self.data['removable_user_ids']:
+            return None
+        return await self.client.delete('/permission/delete', headers=self.auth(self.data['admin']),
+                                        params={'user_id': self.data['removable_user_ids'].pop()})
+
+
+#  операция -> относительный вес в смеси запросов (чтение преобладает, как в реальном трафике)
+OPERATIONS = {
+    'products_list': 20, 'products_filtered': 10, 'products_by_category': 10, 'products_detail': 30,
+    'products_search': 10, 'products_export': 0.1, 'products_create': 1, 'products_update': 1,
+    'products_delete': 0.5, 'products_import': 0.2,
+    'categories_list': 10, 'categories_create': 0.2, 'categories_update': 0.2, 'categories_delete': 0.1,
+    'reviews_list': 1, 'reviews_product': 10, 'reviews_add': 3, 'reviews_delete': 0.5,
+    'auth_token': 1, 'auth_refresh': 2, 'auth_me': 5, 'auth_create': 0.5,
+    'permission_toggle': 0.5, 'permission_delete': 0.1,
+}
+
+
+async def worker(scenario: Scenario, operations: list, weights: list, deadline: float, samples: dict):
+    while perf_counter() < deadline:
+        name = scenario.rng.choices(operations, weights)[0]
+        started = perf_counter()
+        try:
+            response = await getattr(scenario, name)()
+        except httpx.HTTPError:
+            samples[name]['errors'] += 1
+            continue
+        if response is None:
+            continue
+        elapsed = perf_counter() - started
+        sample = samples[name]
+        sample['latencies'].append(elapsed)
+        if response.status_code >= 500:
+            sample['errors'] += 1
+        elif response.status_code >= 400:
+            sample['client_errors'] += 1
+
+
+def summarize(latencies: list, duration: float) -> dict:
+    if len(latencies) < 2:
+        return {'count': len(latencies), 'rps': round(len(latencies) / duration, 2)}
+    percentiles = quantiles(latencies, n=100, method='inclusive')
+    return {'count': len(latencies),
+            'rps': round(len(latencies) / duration, 2),
+            'mean_ms': round(mean(latencies) * 1000, 2),
+            'p50_ms': round(percentiles[49] * 1000, 2),
+            'p95_ms': round(percentiles[94] * 1000, 2),
+            'p99_ms': round(percentiles[98] * 1000, 2)}
+
+
+async def run(args, base_url: str, data: dict) -> dict:
+    operations = [name for name in OPERATIONS if not args.only or name in args.only]
+    weights = [OPERATIONS[name] for name in operations]
+    samples = {name: {'latencies': [], 'errors': 0, 'client_errors': 0} for name in operations}
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        scenario = Scenario(client, data, random.Random(args.random_seed))
+        for username in [data['admin'], data['supplier']] + data['users']:
+            await scenario.login(username)
+
+        started = perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*[worker(scenario, operations, weights, deadline, samples)
+                               for _ in range(args.concurrency)])
+        duration = perf_counter() - started
+
+    results = {}
+    for name, sample in samples.items():
+        results[name] = {**summarize(sample['latencies'], duration),
+                         'errors': sample['errors'], 'client_errors': sample['client_errors']}
+    all_latencies = [latency for sample in samples.values() for latency in sample['latencies']]
+    return {'duration_s': round(duration, 2), 'total': summarize(all_latencies, duration), 'operations': results}
+
+
+def start_server(args) -> subprocess.Popen:
+    command = [sys.executable, '-m', 'uvicorn', 'app.main:app', '--host', '127.0.0.1', '--port', str(args.port),
+               '--workers', str(args.workers), '--log-level', 'warning', '--no-access-log']
+    return subprocess.Popen(command, env=os.environ.copy())
+
+
+async def wait_for_server(base_url: str, timeout: float = 30):
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        deadline = perf_counter() + timeout
+        while perf_counter() < deadline:
+            try:
+                await client.get('/')
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f'Server at {base_url} did not start in {timeout} s')
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report: dict):
+    print(f"{'operation':<22}{'count':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'5xx':>6}{'4xx':>6}")
+    for name, result in {**report['operations'], 'TOTAL': report['total']}.items():
+        print(f"{name:<22}{result['count']:>8}{result['rps']:>10}{result.get('p50_ms', '-'):>10}"
+              f"{result.get('p95_ms', '-'):>10}{result.get('p99_ms', '-'):>10}"
+              f"{result.get('errors', ''):>6}{result.get('client_errors', ''):>6}")
+
+
+async def main_async(args):
+    prefix = args.prefix or f'bench{int(time())}'
+    if args.seed:
+        data = await generate(args.random_seed, prefix, args.products, args.categories, args.depth, args.users,
+                              args.suppliers, args.reviews)
+        if args.data:
+            with open(args.data, 'w') as file:
+                json.dump(data, file)
+    elif args.data:
+        with open(args.data) as file:
+            data = json.load(file)
+    else:
+        raise SystemExit('Use --seed to create a dataset or --data to reuse a saved one')
+    data = prepare(data, args.logins)
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        base_url = f'http://127.0.0.1:{args.port}'
+        server = start_server(args)
+    try:
+        await wait_for_server(base_url)
+        report = await run(args, base_url, data)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    report = {'commit': git_commit(), 'timestamp': int(time()),
+              'config': {key: value for key, value in vars(args).items() if key not in ('out', 'data')},
+              **report}
+    print_report(report)
+    if args.out:
+        with open(args.out, 'w') as file:
+            json.dump(report, file, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='адрес уже запущенного приложения; без него uvicorn запускается сам')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=1, help='процессы uvicorn')
+    parser.add_argument('--seed', action='store_true', help='создать синтетический каталог перед прогоном')
+    parser.add_argument('--data', help='описание набора: сохраняется при --seed, без него читается '
+                                       '(например, файл --out из benchmarks.generate_data)')
+    parser.add_argument('--prefix', help='префикс имён синтетических данных')
+    parser.add_argument('--random-seed', type=int, default=42)
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--categories', type=int, default=100)
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--suppliers', type=int, default=5)
+    parser.add_argument('--reviews', type=int, default=20000)
+    parser.add_argument('--logins', type=int, default=20, help='сколько покупателей логинится перед прогоном')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30, help='длительность прогона в секундах')
+    parser.add_argument('--only', nargs='*', choices=sorted(OPERATIONS), help='прогнать только эти операции')
+    parser.add_argument('--out', help='куда записать результаты в JSON')
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()